@@ -1,6 +1,6 @@
 """Agent CRUD endpoints."""
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only
 from typing import List
 
 from db.database import get_db_session
@@ -22,7 +22,7 @@ def verify_session(session_id: str, db: Session) -> SessionModel:
 
 
 @router.get("", response_model=List[Agent])
-async def list_agents(
+def list_agents(
     session_id: str = Query(..., description="Session ID"),
     db: Session = Depends(get_db_session)
 ):
@@ -33,7 +33,7 @@ async def list_agents(
 
 
 @router.post("", response_model=Agent, status_code=status.HTTP_201_CREATED)
-async def create_agent(
+def create_agent(
     agent_data: AgentCreate,
     session_id: str = Query(..., description="Session ID"),
     db: Session = Depends(get_db_session)
@@ -56,7 +56,7 @@ async def create_agent(
         system_prompt=agent_data.system_prompt,
         tools=[tool.model_dump() for tool in agent_data.tools],
         parameters=agent_data.parameters,
-        photo_injection_enabled="true" if agent_data.photo_injection_enabled else "false",
+        photo_injection_enabled=agent_data.photo_injection_enabled,
         photo_injection_features=agent_data.photo_injection_features or [],
         parent_id=agent_data.parent_id,
         position_x=agent_data.position_x,
@@ -64,14 +64,13 @@ async def create_agent(
     )
     db.add(agent)
     db.commit()
-    db.refresh(agent)
     logger.info("agent_created", agent_id=agent.id, name=agent.name, session_id=session_id)
     get_agent_tree_cache().invalidate(session_id)
     return Agent.model_validate(agent)
 
 
 @router.get("/{agent_id}", response_model=Agent)
-async def get_agent(
+def get_agent(
     agent_id: str,
     session_id: str = Query(..., description="Session ID"),
     db: Session = Depends(get_db_session)
@@ -88,7 +87,7 @@ async def get_agent(
 
 
 @router.put("/{agent_id}", response_model=Agent)
-async def update_agent(
+def update_agent(
     agent_id: str,
     agent_data: AgentUpdate,
     session_id: str = Query(..., description="Session ID"),
@@ -120,7 +119,10 @@ async def update_agent(
         current = update_data["parent_id"]
         visited = {agent_id, current}
         while current:
-            parent_agent = db.query(AgentModel).filter(
+            # Only the parent pointer is needed; skip the prompt and JSON columns
+            parent_agent = db.query(AgentModel).options(
+                load_only(AgentModel.id, AgentModel.parent_id)
+            ).filter(
                 AgentModel.id == current,
                 AgentModel.session_id == session_id
             ).first()
@@ -136,22 +138,21 @@ async def update_agent(
     if "tools" in update_data:
         update_data["tools"] = [tool.model_dump() if isinstance(tool, dict) else tool for tool in update_data["tools"]]
     
-    # Convert photo_injection_enabled bool to string for database
-    if "photo_injection_enabled" in update_data:
-        update_data["photo_injection_enabled"] = "true" if update_data["photo_injection_enabled"] else "false"
+    # Column is NOT NULL; an explicit null leaves the flag unchanged
+    if update_data.get("photo_injection_enabled", False) is None:
+        del update_data["photo_injection_enabled"]
     
     for key, value in update_data.items():
         setattr(agent, key, value)
     
     db.commit()
-    db.refresh(agent)
     logger.info("agent_updated", agent_id=agent.id)
     get_agent_tree_cache().invalidate(session_id)
     return Agent.model_validate(agent)
 
 
 @router.delete("/{agent_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_agent(
+def delete_agent(
     agent_id: str,
     session_id: str = Query(..., description="Session ID"),
     db: Session = Depends(get_db_session)
@@ -165,25 +166,24 @@ async def delete_agent(
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
-    # Find all children (recursive, within same session)
-    def get_all_children(parent_id: str, visited: set = None) -> list:
-        if visited is None:
-            visited = set()
-        if parent_id in visited:
-            return []
-        visited.add(parent_id)
-        children = db.query(AgentModel).filter(
-            AgentModel.parent_id == parent_id,
-            AgentModel.session_id == session_id
-        ).all()
-        result = list(children)
-        for child in children:
-            result.extend(get_all_children(child.id, visited))
+    # Find the ids of all children (within same session), one level per query
+    def get_all_children(root_id: str) -> list:
+        result = []
+        visited = {root_id}
+        frontier = [root_id]
+        while frontier:
+            child_ids = db.query(AgentModel.id).filter(
+                AgentModel.parent_id.in_(frontier),
+                AgentModel.session_id == session_id
+            ).all()
+            frontier = [child_id for (child_id,) in child_ids if child_id not in visited]
+            visited.update(frontier)
+            result.extend(frontier)
         return result
     
     # Get all children to delete
     all_children = get_all_children(agent_id)
-    all_ids_to_delete = [agent_id] + [child.id for child in all_children]
+    all_ids_to_delete = [agent_id] + all_children
     
     # Delete all links involving these agents (within session)
     db.query(LinkModel).filter(
@@ -192,12 +192,12 @@ async def delete_agent(
          (LinkModel.child_agent_id.in_(all_ids_to_delete)))
     ).delete(synchronize_session=False)
     
-    # Delete all child agents first (to respect foreign key constraints)
-    for child in all_children:
-        db.delete(child)
-    
-    # Delete the agent itself
-    db.delete(agent)
+    # Delete the agent and its whole subtree in one statement; foreign keys are
+    # checked at statement end, so parent/child order within it does not matter
+    db.query(AgentModel).filter(
+        AgentModel.session_id == session_id,
+        AgentModel.id.in_(all_ids_to_delete)
+    ).delete(synchronize_session=False)
     db.commit()
     
     logger.info("agent_deleted", agent_id=agent_id, children_deleted=len(all_children))
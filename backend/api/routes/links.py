@@ -1,6 +1,6 @@
 """Link management endpoints."""
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only
 
 from db.database import get_db_session
 from db.schemas import LinkModel, AgentModel, SessionModel
@@ -30,7 +30,10 @@ def check_cycle(parent_id: str, child_id: str, session_id: str, db: Session) ->
         if current in visited:
             break
         visited.add(current)
-        agent = db.query(AgentModel).filter(
+        # Only the parent pointer is needed; skip the prompt and JSON columns
+        agent = db.query(AgentModel).options(
+            load_only(AgentModel.id, AgentModel.parent_id)
+        ).filter(
             AgentModel.id == current,
             AgentModel.session_id == session_id
         ).first()
@@ -41,7 +44,7 @@ def check_cycle(parent_id: str, child_id: str, session_id: str, db: Session) ->
 
 
 @router.post("", response_model=Link, status_code=status.HTTP_201_CREATED)
-async def create_link(
+def create_link(
     link_data: LinkCreate,
     session_id: str = Query(..., description="Session ID"),
     db: Session = Depends(get_db_session)
@@ -85,7 +88,6 @@ async def create_link(
     )
     db.add(link)
     db.commit()
-    db.refresh(link)
     
     # Update child's parent_id
     child.parent_id = link_data.parent_agent_id
@@ -97,7 +99,7 @@ async def create_link(
 
 
 @router.delete("", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_link(
+def delete_link(
     link_data: LinkCreate,
     session_id: str = Query(..., description="Session ID"),
     db: Session = Depends(get_db_session)
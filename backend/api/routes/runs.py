@@ -3,7 +3,9 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import datetime
+import asyncio
 import json
+import orjson
 
 from db.database import get_db_session
 from db.schemas import RunModel, AgentModel, SessionModel
@@ -14,6 +16,28 @@ from core.logging import get_logger
 logger = get_logger("runs")
 router = APIRouter(prefix="/runs", tags=["runs"])
 
+# Max SSE frames coalesced into one transport write when events arrive in a burst
+SSE_MAX_FRAMES_PER_WRITE = 16
+# Max events buffered ahead of the SSE writer; a slow client then holds back the orchestrator
+SSE_QUEUE_SIZE = 4 * SSE_MAX_FRAMES_PER_WRITE
+# Queue marker: the orchestrator generator is exhausted
+_STREAM_END = object()
+
+
+async def _pump_events(events, queue: asyncio.Queue) -> None:
+    """Move orchestrator events into a queue so the SSE writer can drain bursts at once."""
+    try:
+        async for event in events:
+            await queue.put(event)
+    except asyncio.CancelledError:
+        # Only the departing SSE writer cancels the pump; nobody is left to take the
+        # marker, and waiting for room in the bounded queue would never finish
+        raise
+    except Exception:
+        await queue.put(_STREAM_END)
+        raise
+    await queue.put(_STREAM_END)
+
 
 def verify_session(session_id: str, db: Session) -> SessionModel:
     """Verify session exists and return it."""
@@ -24,7 +48,7 @@ def verify_session(session_id: str, db: Session) -> SessionModel:
 
 
 @router.post("", response_model=Run, status_code=status.HTTP_201_CREATED)
-async def create_run(
+def create_run(
     run_data: RunRequest,
     session_id: str = Query(..., description="Session ID"),
     db: Session = Depends(get_db_session)
@@ -48,14 +72,13 @@ async def create_run(
     )
     db.add(run)
     db.commit()
-    db.refresh(run)
     
     logger.info("run_created", run_id=run.id, root_agent_id=run_data.root_agent_id, session_id=session_id)
     return Run.model_validate(run)
 
 
 @router.get("/{run_id}", response_model=Run)
-async def get_run(
+def get_run(
     run_id: str,
     session_id: str = Query(..., description="Session ID"),
     db: Session = Depends(get_db_session)
@@ -73,7 +96,7 @@ async def get_run(
 
 
 @router.get("/{run_id}/stream")
-async def stream_run(
+def stream_run(
     run_id: str,
     request: Request,
     session_id: str = Query(..., description="Session ID"),
@@ -119,37 +142,65 @@ async def stream_run(
             
             logger.info("sse_starting_orchestrator", run_id=run_id, root_agent_id=run.root_agent_id, has_images=bool(run_images))
             
-            async for event in orchestrator.execute_run(
-                run_id=run_id,
-                root_agent_id=run.root_agent_id,
-                input_data=run_input_clean,
-                api_key=api_key,
-                images=run_images if run_images else None,
-            ):
-                # Format as SSE
-                event_type = event.get("type", "log")
-                agent_id = event.get("agent_id", "")
-                data = event.get("data", "")
-                
-                # Log important events
-                if event_type in ["output", "output_chunk", "error", "status"]:
-                    logger.info("sse_event", run_id=run_id, event_type=event_type, agent_id=agent_id[:20] if agent_id else "none", data_length=len(str(data)))
-                
-                # Send event
-                event_json = json.dumps({
-                    "type": event_type,
-                    "agent_id": agent_id,
-                    "data": data,
-                })
-                yield f"event: {event_type}\n"
-                yield f"data: {event_json}\n\n"
-                
-                event_count += 1
+            # Events are pumped through a queue; whatever has queued up while the previous
+            # write was in flight goes out as one chunk (each frame keeps its own event type)
+            queue: asyncio.Queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+            producer = asyncio.create_task(_pump_events(
+                orchestrator.execute_run(
+                    run_id=run_id,
+                    root_agent_id=run.root_agent_id,
+                    input_data=run_input_clean,
+                    api_key=api_key,
+                    images=run_images if run_images else None,
+                ),
+                queue,
+            ))
+            try:
+                stream_done = False
+                while not stream_done:
+                    frames = []
+                    event = await queue.get()
+                    while True:
+                        if event is _STREAM_END:
+                            stream_done = True
+                            break
+                        
+                        # Format as SSE
+                        event_type = event.get("type", "log")
+                        agent_id = event.get("agent_id", "")
+                        data = event.get("data", "")
+                        
+                        # Log important events
+                        if event_type in ["output", "output_chunk", "error", "status"]:
+                            logger.info("sse_event", run_id=run_id, event_type=event_type, agent_id=agent_id[:20] if agent_id else "none", data_length=len(str(data)))
+                        
+                        # Send event (orjson serializes straight to UTF-8 bytes)
+                        event_json = orjson.dumps({
+                            "type": event_type,
+                            "agent_id": agent_id,
+                            "data": data,
+                        })
+                        frames.append(b"event: %s\ndata: %s\n\n" % (event_type.encode(), event_json))
+                        
+                        event_count += 1
+                        
+                        # Send heartbeat every 10 events (instead of every event)
+                        if event_count % 10 == 0:
+                            frames.append(b": heartbeat\n\n")
+                            logger.debug("sse_heartbeat", run_id=run_id, event_count=event_count)
+                        
+                        if len(frames) >= SSE_MAX_FRAMES_PER_WRITE or queue.empty():
+                            break
+                        event = queue.get_nowait()
+                    
+                    if frames:
+                        yield b"".join(frames)
                 
-                # Send heartbeat every 10 events (instead of every event)
-                if event_count % 10 == 0:
-                    yield f": heartbeat\n\n"
-                    logger.debug("sse_heartbeat", run_id=run_id, event_count=event_count)
+                # Re-raise anything the orchestrator raised
+                await producer
+            finally:
+                if not producer.done():
+                    producer.cancel()
             
             logger.info("sse_orchestrator_complete", run_id=run_id, total_events=event_count)
             
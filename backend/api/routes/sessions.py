@@ -1,11 +1,10 @@
 """Session management endpoints."""
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from typing import List
-from datetime import datetime
 
 from db.database import get_db_session
-from db.schemas import SessionModel
+from db.schemas import AgentModel, RunModel, SessionModel, utcnow
 from core.models import Session, SessionCreate
 from core.logging import get_logger
 from core.agent_tree_cache import get_agent_tree_cache
@@ -15,14 +14,14 @@ router = APIRouter(prefix="/sessions", tags=["sessions"])
 
 
 @router.get("", response_model=List[Session])
-async def list_sessions(db: Session = Depends(get_db_session)):
+def list_sessions(db: Session = Depends(get_db_session)):
     """List all sessions."""
     sessions = db.query(SessionModel).order_by(SessionModel.last_accessed.desc()).all()
     return [Session.model_validate(session) for session in sessions]
 
 
 @router.post("", response_model=Session, status_code=status.HTTP_201_CREATED)
-async def create_session(session_data: SessionCreate, db: Session = Depends(get_db_session)):
+def create_session(session_data: SessionCreate, db: Session = Depends(get_db_session)):
     """Create a new session."""
     # Check if session name already exists
     existing = db.query(SessionModel).filter(SessionModel.name == session_data.name).first()
@@ -32,37 +31,38 @@ async def create_session(session_data: SessionCreate, db: Session = Depends(get_
             detail=f"Session with name '{session_data.name}' already exists"
         )
     
-    session = SessionModel(
-        name=session_data.name,
-        created_at=datetime.utcnow(),
-        last_accessed=datetime.utcnow(),
-    )
+    session = SessionModel(name=session_data.name)
     db.add(session)
     db.commit()
-    db.refresh(session)
     logger.info("session_created", session_id=session.id, name=session.name)
     return Session.model_validate(session)
 
 
 @router.get("/{session_id}", response_model=Session)
-async def get_session(session_id: str, db: Session = Depends(get_db_session)):
+def get_session(session_id: str, db: Session = Depends(get_db_session)):
     """Get a single session by ID."""
     session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
     # Update last accessed
-    session.last_accessed = datetime.utcnow()
+    session.last_accessed = utcnow()
     db.commit()
-    db.refresh(session)
     
     return Session.model_validate(session)
 
 
 @router.delete("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_session(session_id: str, db: Session = Depends(get_db_session)):
+def delete_session(session_id: str, db: Session = Depends(get_db_session)):
     """Delete a session and all its associated data (cascade)."""
-    session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
+    # The cascade walks every collection, and deleting each agent touches its
+    # children backref; load them all with one IN query per relationship instead
+    # of a lazy load per agent
+    session = db.query(SessionModel).options(
+        selectinload(SessionModel.agents).selectinload(AgentModel.children),
+        selectinload(SessionModel.links),
+        selectinload(SessionModel.runs).selectinload(RunModel.logs),
+    ).filter(SessionModel.id == session_id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
@@ -1,16 +1,26 @@
 """Dynamic agent selection based on task requirements."""
-from typing import List, Dict
+from typing import List, Dict, Tuple
+from collections import OrderedDict
 from db.schemas import AgentModel
 from core.gemini_client import generate_text
 from core.logging import get_logger
+from core.settings import settings
+import hashlib
 import json
+import time
 
 logger = get_logger("agent_selector")
 
+# Max remembered selections; least recently used entries are evicted first
+_SELECTION_CACHE_SIZE = 1024
+
 
 class AgentSelector:
     """Selects relevant agents for a given task."""
     
+    # Selection prompt digest -> (selected agent ids, expiry on the monotonic clock)
+    _selection_cache: "OrderedDict[bytes, Tuple[List[str], float]]" = OrderedDict()
+    
     @staticmethod
     async def select_agents(
         task: str,
@@ -68,6 +78,17 @@ Respond with ONLY a JSON array of agent IDs that are needed. Examples:
 
 Your response (JSON array only):"""
 
+        # The prompt embeds the task and every candidate's id, name, role and system
+        # prompt, so its digest only repeats when the selection inputs are identical
+        cache_key = hashlib.blake2b(prompt.encode(), digest_size=16).digest()
+        cache = AgentSelector._selection_cache
+        cached = cache.get(cache_key)
+        if cached and cached[1] > time.monotonic():
+            cache.move_to_end(cache_key)
+            cached_ids = cached[0]
+            logger.info("agent_selection_cache_hit", selected_count=len(cached_ids))
+            return [a for a in available_agents if a.id in cached_ids]
+
         try:
             # Get LLM selection
             response = await generate_text(
@@ -94,6 +115,15 @@ Your response (JSON array only):"""
             # Filter agents
             selected_agents = [a for a in available_agents if a.id in selected_ids]
             
+            # Only parsed verdicts are remembered; failures fall through uncached
+            cache[cache_key] = (
+                [a.id for a in selected_agents],
+                time.monotonic() + settings.agent_selection_cache_ttl_seconds,
+            )
+            cache.move_to_end(cache_key)
+            if len(cache) > _SELECTION_CACHE_SIZE:
+                cache.popitem(last=False)
+            
             logger.info(
                 "agents_selected",
                 task_length=len(task),
@@ -4,8 +4,8 @@ Optimizes performance by avoiding repeated database queries and LLM capability a
 """
 from typing import Dict, Optional, List
 from dataclasses import dataclass, field
-from datetime import datetime
 import asyncio
+import time
 
 from db.schemas import AgentModel
 from core.delegation import AgentCapability
@@ -26,12 +26,15 @@ class AgentTreeSnapshot:
     capability_map: AgentCapability
     agent_count: int
     max_depth: int
-    created_at: datetime = field(default_factory=datetime.utcnow)
-    last_accessed: datetime = field(default_factory=datetime.utcnow)
+    # time.monotonic() readings: only compared within this process, and immune to clock changes
+    created_at: float = field(default_factory=time.monotonic)
+    last_accessed: float = field(default_factory=time.monotonic)
+    # Memoized result of available_agents_summary(); the tree is immutable once cached
+    _agents_summary: Optional[str] = field(default=None, repr=False, compare=False)
     
     def update_access_time(self):
         """Update last accessed timestamp."""
-        self.last_accessed = datetime.utcnow()
+        self.last_accessed = time.monotonic()
     
     def get_all_agent_ids(self) -> List[str]:
         """Get flat list of all agent IDs in tree."""
@@ -45,6 +48,14 @@ class AgentTreeSnapshot:
         collect_ids(self.capability_map)
         return ids
     
+    def available_agents_summary(self) -> str:
+        """Comma-separated root and immediate child names, built on first use."""
+        if self._agents_summary is None:
+            names = [self.capability_map.agent_name]
+            names.extend(c.agent_name for c in self.capability_map.children)
+            self._agents_summary = ", ".join(names)
+        return self._agents_summary
+    
     def find_agent_capability(self, agent_id: str) -> Optional[AgentCapability]:
         """Find capability info for specific agent."""
         return self.capability_map.find_agent(agent_id)
@@ -65,7 +76,7 @@ class AgentTreeCache:
     def __init__(self):
         self._cache: Dict[str, AgentTreeSnapshot] = {}
         self._lock = asyncio.Lock()
-        self._invalidation_timestamps: Dict[str, datetime] = {}
+        self._invalidation_timestamps: Dict[str, float] = {}
     
     async def get_or_build(
         self,
@@ -189,13 +200,13 @@ class AgentTreeCache:
         """
         if root_agent_id:
             cache_key = f"{session_id}_{root_agent_id}"
-            self._invalidation_timestamps[cache_key] = datetime.utcnow()
+            self._invalidation_timestamps[cache_key] = time.monotonic()
             logger.info("cache_invalidated_specific", cache_key=cache_key)
         else:
             # Invalidate all for session
             for cache_key in list(self._cache.keys()):
                 if cache_key.startswith(f"{session_id}_"):
-                    self._invalidation_timestamps[cache_key] = datetime.utcnow()
+                    self._invalidation_timestamps[cache_key] = time.monotonic()
                     logger.info("cache_invalidated_session", session_id=session_id)
     
     def clear_session(self, session_id: str):
@@ -1,9 +1,10 @@
 """
 Multi-level delegation system for recursive agent communication.
 """
-from typing import List, Dict, Optional, Set
+from typing import FrozenSet, List, Dict, Optional, Set, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
+import threading
 import uuid
 import time
 
@@ -18,33 +19,66 @@ class DelegationStatus(Enum):
     NEEDS_USER_INPUT = "needs_user_input"
 
 
+class DelegationRejected(Exception):
+    """Raised when a request would be invalid; carries the messages to report back."""
+    
+    def __init__(self, error_message: str, log_message: str):
+        super().__init__(error_message)
+        self.error_message = error_message
+        self.log_message = log_message
+
+
+class CycleError(DelegationRejected):
+    """The request would visit the same agent twice."""
+
+
+class DepthExceeded(DelegationRejected):
+    """The request would exceed its max hops."""
+
+
 @dataclass
 class DelegationRequest:
     """
     A request that can travel through agent hierarchy.
     
-    Tracks path to prevent cycles and enforce depth limits.
+    Tracks path to prevent cycles and enforce depth limits. Both are checked when a
+    request is constructed, so any existing request is acyclic and within depth.
     """
     request_id: str = field(default_factory=lambda: str(uuid.uuid4()))
     original_agent_id: str = ""
     current_agent_id: str = ""
     task: str = ""
     context: Dict = field(default_factory=dict)
-    path: List[str] = field(default_factory=list)  # Agents visited
+    path: Tuple[str, ...] = ()  # Agents visited; immutable so forwarded requests share it safely
     attempts: int = 0
     max_hops: int = 10
     timeout: float = 30.0  # seconds
     created_at: float = field(default_factory=time.time)
+    _path_set: FrozenSet[str] = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self._path_set = frozenset(self.path)
+        if len(self._path_set) != len(self.path):
+            raise CycleError(f"Cycle detected: {self.path}", f"Cycle detected in path: {self.path}")
+        if self.attempts >= self.max_hops:
+            raise DepthExceeded(
+                f"Max depth exceeded: {self.max_hops} hops",
+                f"Max depth exceeded ({self.max_hops} hops)"
+            )
     
     def forward_to(self, agent_id: str) -> 'DelegationRequest':
-        """Create a new request forwarded to another agent."""
+        """
+        Create a new request forwarded to another agent.
+        
+        Raises CycleError or DepthExceeded instead of building an invalid request.
+        """
         return DelegationRequest(
             request_id=self.request_id,
             original_agent_id=self.original_agent_id,
             current_agent_id=agent_id,
             task=self.task,
             context=self.context,
-            path=self.path + [agent_id],
+            path=self.path + (agent_id,),
             attempts=self.attempts + 1,
             max_hops=self.max_hops,
             timeout=self.timeout,
@@ -52,8 +86,8 @@ class DelegationRequest:
         )
     
     def has_cycle(self) -> bool:
-        """Check if request has visited same agent twice."""
-        return len(self.path) != len(set(self.path))
+        """Check if request has visited same agent twice (never true once constructed)."""
+        return len(self.path) != len(self._path_set)
     
     def is_expired(self) -> bool:
         """Check if request has exceeded timeout."""
@@ -74,7 +108,7 @@ class DelegationResponse:
     status: DelegationStatus
     result: str = ""
     confidence: float = 0.0  # 0.0-1.0
-    path: List[str] = field(default_factory=list)  # Path taken to fulfill
+    path: Tuple[str, ...] = ()  # Path taken to fulfill
     child_responses: List['DelegationResponse'] = field(default_factory=list)
     error_message: Optional[str] = None
     metadata: Dict = field(default_factory=dict)
@@ -133,29 +167,42 @@ class CircuitBreaker:
         self.timeout = timeout
         self.failures: Dict[str, int] = {}
         self.open_until: Dict[str, float] = {}
+        # Shared across requests (see GLOBAL_BREAKER), which may run in different threads
+        self._lock = threading.Lock()
     
     def should_try(self, agent_id: str) -> bool:
         """Check if we should try this agent."""
-        if agent_id in self.open_until:
-            if time.time() < self.open_until[agent_id]:
+        # Lock-free fast path for the common case of a closed circuit
+        if agent_id not in self.open_until:
+            return True
+        with self._lock:
+            open_until = self.open_until.get(agent_id)
+            if open_until is None:
+                return True
+            if time.time() < open_until:
                 return False  # Circuit still open
-            else:
-                # Circuit timeout expired, reset
-                del self.open_until[agent_id]
-                self.failures[agent_id] = 0
+            # Circuit timeout expired, reset
+            del self.open_until[agent_id]
+            self.failures[agent_id] = 0
         return True
     
     def record_success(self, agent_id: str):
         """Record successful execution."""
-        if agent_id in self.failures:
-            self.failures[agent_id] = max(0, self.failures[agent_id] - 1)
+        with self._lock:
+            if agent_id in self.failures:
+                self.failures[agent_id] = max(0, self.failures[agent_id] - 1)
     
     def record_failure(self, agent_id: str):
         """Record failed execution."""
-        self.failures[agent_id] = self.failures.get(agent_id, 0) + 1
-        if self.failures[agent_id] >= self.failure_threshold:
-            # Open circuit
-            self.open_until[agent_id] = time.time() + self.timeout
+        with self._lock:
+            self.failures[agent_id] = self.failures.get(agent_id, 0) + 1
+            if self.failures[agent_id] >= self.failure_threshold:
+                # Open circuit
+                self.open_until[agent_id] = time.time() + self.timeout
+
+
+# Process-wide breaker: an agent failing in one request trips it for every request
+GLOBAL_BREAKER = CircuitBreaker()
 
 
 class DelegationRouter:
@@ -1,20 +1,47 @@
 """Google Gemini API client."""
 import os
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import timedelta
 import google.generativeai as genai
-from typing import Optional, AsyncGenerator
+from google.generativeai import caching
+from typing import Dict, Optional, AsyncGenerator, Tuple
 
 from core.settings import settings
 from core.logging import get_logger
 
 logger = get_logger("gemini")
 
+# Server-side system-prompt caches: key -> (cached content, local expiry on the monotonic clock),
+# least recently used first; None marks a recent creation failure
+_prompt_caches: "OrderedDict[str, Tuple[Optional[caching.CachedContent], float]]" = OrderedDict()
+# In-flight cache creations, so concurrent callers with the same prompt share one request
+_prompt_cache_pending: Dict[str, "asyncio.Future[Optional[caching.CachedContent]]"] = {}
+# Stop reusing a cache this many seconds before Gemini expires it
+_PROMPT_CACHE_EXPIRY_MARGIN = 30
+# Most cache handles kept locally; older ones are left to expire server-side
+_PROMPT_CACHE_SIZE = 256
+# Seconds to send a prompt inline without retrying after its cache creation failed
+_PROMPT_CACHE_FAILURE_TTL = 300
+
+
+# Key the SDK was last configured with; genai.configure() drops the SDK's cached
+# service clients, so re-running it per call would reopen the connection every time
+_configured_api_key: Optional[str] = None
+
 
 def configure_gemini(api_key: Optional[str] = None) -> None:
     """Configure Gemini API with API key from settings."""
+    global _configured_api_key
     key = api_key or settings.gemini_api_key
     if not key:
         raise ValueError("GEMINI_API_KEY not set in environment")
+    if key == _configured_api_key:
+        return
     genai.configure(api_key=key)
+    _configured_api_key = key
 
 
 async def generate_text(
@@ -118,6 +145,84 @@ async def generate_text(
         return f"[Error: {str(e)}]"
 
 
+async def get_prompt_cache(
+    system_prompt: str,
+    model: str,
+    api_key: Optional[str] = None,
+) -> Optional[caching.CachedContent]:
+    """
+    Return a Gemini cached content holding system_prompt, creating it on first use.
+    
+    Returns None when the prompt is below settings.gemini_prompt_cache_min_chars
+    (Gemini rejects caches under its minimum token count) or when caching fails
+    (failures are remembered for _PROMPT_CACHE_FAILURE_TTL seconds); callers then
+    send the system prompt inline as before.
+    """
+    if len(system_prompt) < settings.gemini_prompt_cache_min_chars:
+        return None
+    
+    # Caches are scoped to the API key's project and bound to one model
+    key = hashlib.blake2b(
+        "\0".join((api_key or settings.gemini_api_key, model, system_prompt)).encode(),
+        digest_size=16,
+    ).hexdigest()
+    now = time.monotonic()
+    cached = _prompt_caches.get(key)
+    if cached:
+        if cached[1] > now:
+            _prompt_caches.move_to_end(key)
+            return cached[0]
+        del _prompt_caches[key]
+    
+    pending = _prompt_cache_pending.get(key)
+    if pending is None:
+        pending = asyncio.ensure_future(_create_prompt_cache(key, system_prompt, model, api_key))
+        _prompt_cache_pending[key] = pending
+        pending.add_done_callback(lambda _: _prompt_cache_pending.pop(key, None))
+    # Shielded so one cancelled caller does not abort the creation for the others
+    return await asyncio.shield(pending)
+
+
+async def _create_prompt_cache(
+    key: str,
+    system_prompt: str,
+    model: str,
+    api_key: Optional[str],
+) -> Optional[caching.CachedContent]:
+    """Create a Gemini cached content for system_prompt and remember it under key."""
+    configure_gemini(api_key)
+    ttl = settings.gemini_prompt_cache_ttl_seconds
+    try:
+        cache = await asyncio.to_thread(
+            caching.CachedContent.create,
+            model=model,
+            system_instruction=system_prompt,
+            ttl=timedelta(seconds=ttl),
+        )
+    except Exception as e:
+        logger.warning("gemini_prompt_cache_failed", error=str(e), model=model)
+        # Remember the failure so every execution does not repeat the round trip
+        _remember_prompt_cache(key, None, _PROMPT_CACHE_FAILURE_TTL)
+        return None
+    
+    _remember_prompt_cache(key, cache, ttl - _PROMPT_CACHE_EXPIRY_MARGIN)
+    logger.info("gemini_prompt_cache_created", model=model, prompt_length=len(system_prompt))
+    return cache
+
+
+def _remember_prompt_cache(key: str, cache: Optional[caching.CachedContent], lifetime: float) -> None:
+    """Store a cache handle (or failure marker) for lifetime seconds, keeping the map bounded."""
+    now = time.monotonic()
+    _prompt_caches[key] = (cache, now + lifetime)
+    _prompt_caches.move_to_end(key)
+    # Drop expired entries from the cold end, then bound the size
+    while _prompt_caches:
+        oldest_key, (_, expires_at) = next(iter(_prompt_caches.items()))
+        if expires_at > now and len(_prompt_caches) <= _PROMPT_CACHE_SIZE:
+            break
+        del _prompt_caches[oldest_key]
+
+
 async def generate_streaming(
     system_prompt: str,
     user_input: str,
@@ -125,6 +230,7 @@ async def generate_streaming(
     temperature: float = 0.7,
     api_key: Optional[str] = None,
     images: Optional[list[str]] = None,
+    cached_content: Optional[caching.CachedContent] = None,
 ) -> AsyncGenerator[str, None]:
     """
     Generate text with streaming support.
@@ -136,6 +242,7 @@ async def generate_streaming(
         temperature: Sampling temperature (0-1)
         api_key: Optional API key override
         images: Optional list of base64-encoded image strings
+        cached_content: Optional cache from get_prompt_cache holding system_prompt
     
     Yields chunks of text as they're generated.
     """
@@ -155,11 +262,20 @@ async def generate_streaming(
                 model = "gemini-2.5-flash"
             else:
                 model = "gemini-2.5-pro"
+            # A cache is bound to the model it was created for
+            cached_content = None
 
-        model_client = genai.GenerativeModel(
-            model_name=model,
-            generation_config=generation_config,
-        )
+        if cached_content is not None:
+            # The system prompt is already held server-side; only the user turn is sent
+            model_client = genai.GenerativeModel.from_cached_content(
+                cached_content=cached_content,
+                generation_config=generation_config,
+            )
+        else:
+            model_client = genai.GenerativeModel(
+                model_name=model,
+                generation_config=generation_config,
+            )
         
         # Prepare content: text + images
         import base64
@@ -185,7 +301,10 @@ async def generate_streaming(
                     # Continue with other images
         
         # Add text prompt
-        full_prompt = f"{system_prompt}\n\nUser: {user_input}\n\nAssistant:"
+        if cached_content is not None:
+            full_prompt = f"User: {user_input}\n\nAssistant:"
+        else:
+            full_prompt = f"{system_prompt}\n\nUser: {user_input}\n\nAssistant:"
         content_parts.append(full_prompt)
         
         # Generate with streaming
@@ -1,5 +1,5 @@
 """Pydantic models for API requests/responses."""
-from pydantic import BaseModel, Field, field_validator, model_validator
+from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
@@ -68,17 +68,6 @@ class Agent(AgentBase):
     created_at: datetime
     updated_at: datetime
     
-    @model_validator(mode='before')
-    @classmethod
-    def convert_photo_injection_enabled(cls, data: Any) -> Any:
-        """Convert photo_injection_enabled from string to bool when loading from DB."""
-        if isinstance(data, dict):
-            if 'photo_injection_enabled' in data:
-                val = data['photo_injection_enabled']
-                if isinstance(val, str):
-                    data['photo_injection_enabled'] = val.lower() == "true"
-        return data
-    
     model_config = {
         "from_attributes": True,
     }
@@ -115,6 +104,10 @@ class RunLog(BaseModel):
     timestamp: datetime
     message: str
     level: str = "info"
+    
+    model_config = {
+        "from_attributes": True,
+    }
 
 
 class Run(BaseModel):
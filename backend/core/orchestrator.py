@@ -1,16 +1,183 @@
 """Agent graph execution orchestrator."""
-from typing import Dict, List, Optional, AsyncGenerator, Set
+from typing import Dict, List, Optional, AsyncGenerator, Set, Tuple
+from collections import defaultdict
+from itertools import islice
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified
 from datetime import datetime
 import asyncio
+import bisect
+import hashlib
+import json
+import re
 
 from db.schemas import AgentModel, RunModel
 from core.models import RunLog
 from core.logging import get_logger
+from core.settings import settings
 from core.gemini_client import generate_text, generate_streaming
 
 logger = get_logger("orchestrator")
 
+# Entity/directive patterns used by AgentOrchestrator._extract_intent_from_parent
+# Locations (common patterns: "to X", "in X", "at X", "X and Y")
+_LOC_PATTERNS = [
+    re.compile(r'\bto\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b'),
+    re.compile(r'\bin\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b'),
+    re.compile(r'\bat\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b'),
+    re.compile(r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s+and\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b'),
+]
+# Dates (flexible date patterns)
+_DATE_PATTERNS = [
+    re.compile(r'\b(january|february|march|april|may|june|july|august|september|october|november|december)\s+\d{1,2}\b', re.IGNORECASE),
+    re.compile(r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b', re.IGNORECASE),
+    re.compile(r'\b\d{4}-\d{2}-\d{2}\b', re.IGNORECASE),
+    re.compile(r'\b(spring|summer|fall|autumn|winter)\s+\d{4}\b', re.IGNORECASE),
+]
+# Raw matches examined per location/date pattern (the intent keeps at most 5 of each)
+_ENTITY_MATCH_CAP = 20
+# Every date and number pattern needs at least one digit
+_DIGIT_PATTERN = re.compile(r'\d')
+# Numbers (prices, quantities, etc.)
+_NUM_PATTERN = re.compile(r'\$\d+(?:,\d{3})*(?:\.\d{2})?|\d+(?:,\d{3})*')
+# Action verbs and directives (domain-agnostic)
+_ACTION_PATTERN = re.compile(
+    r'\b(?:please|can you|could you|I need|I want|help|find|search|get|compile|research|analyze|create|plan|book|schedule|recommend|look for|provide|give|show)\b',
+    re.IGNORECASE,
+)
+# Sentence boundaries (punctuation followed by whitespace)
+_SENT_SPLIT = re.compile(r'[.!?]\s+')
+
+# Explicit child -> parent markers used by AgentOrchestrator._extract_child_message,
+# in priority order, with the closing text to strip (if any)
+_CHILD_MARKERS = (
+    ("[QUESTION:", "]"),
+    ("[REQUEST:", "]"),
+    ("[MESSAGE:", "]"),
+    ("[ASK:", "]"),
+    ("Question for parent:", None),
+    ("Request to parent:", None),
+    ("Message to parent:", None),
+    ("I need help:", None),
+    ("Can you clarify:", None),
+    ("Need clarification:", None),
+)
+# One group per marker so a single scan reports which marker matched
+_CHILD_MARKER_RE = re.compile(
+    "|".join(f"({re.escape(marker)})" for marker, _ in _CHILD_MARKERS),
+    re.IGNORECASE,
+)
+# Question indicators for short child outputs without an explicit marker
+_QUESTION_RE = re.compile(r'\?|can you|could you|what|how|why|when|where', re.IGNORECASE)
+
+# Static agent-context text used by AgentOrchestrator._build_context_shell
+_PHOTO_CONTEXT_TEMPLATE = (
+    "\n\n=== PHOTO INJECTION CAPABILITIES ==="
+    "\nYou have been configured to accept and process images. Users can upload photos directly to you."
+    "{capabilities}"
+    "\nWhen images are provided, they will be included along with the text prompt."
+)
+_PHOTO_FEATURES_TEMPLATE = (
+    "\nYour custom photo processing features: {features}"
+    "\nUse these capabilities to analyze images and provide insights based on your configured features."
+)
+_PHOTO_DEFAULT_CAPABILITIES = (
+    "\nYou can analyze images, extract information, identify objects, read text, and provide detailed visual analysis."
+)
+_CHILDREN_CONTEXT_TEMPLATE = (
+    "\n\nYou have child agents that can help you: {names}"
+    "\nYou can delegate tasks to them by providing clear instructions about what you need."
+    "\nIMPORTANT: When delegating to child agents, be specific about what you want them to do."
+    "\nExample: Instead of just passing along the full context, say 'Please find flights to [destination] for [dates]' or 'Search for activities in [location]'."
+    "\n\nWhen your child agents complete their work, they will send you their complete findings as reports."
+    "\nYour job is to compile, organize, and synthesize all their findings into a comprehensive, well-structured response."
+    "\nCompartmentalize information by category and present organized findings to address the user's original request."
+    "\nYour child agents may ask you questions using markers like [QUESTION: ...] or [REQUEST: ...]"
+)
+_PARENT_CONTEXT_TEMPLATE = (
+    "\n\nYou are a child agent of {parent_name}."
+    "\nYour parent has given you a task. Try to understand what they want you to do and proceed accordingly."
+    "\nWhen you complete your work, provide a comprehensive report with your findings, research, and recommendations."
+    "\nYour complete output will be sent back to your parent agent, who will compile all child agent reports into a final organized response."
+    "\nIf the task is unclear or you need more information, you can ask your parent using:"
+    "\n- [QUESTION: your question here]"
+    "\n- [REQUEST: your request here]"
+    "\n- [MESSAGE: your message here]"
+    "\nHowever, try to infer what you can from the context and proceed with reasonable assumptions when possible."
+    "\nProvide thorough, detailed work - your parent will organize and present it to the user."
+)
+
+
+def _action_sentences(text: str) -> List[str]:
+    """
+    Return the sentences of text that contain an action verb or directive.
+    Action verbs are located with a single scan over the whole text and each hit is
+    expanded to its enclosing sentence, so verb-free sentences are never visited.
+    """
+    action_matches = list(_ACTION_PATTERN.finditer(text))
+    if not action_matches:
+        return []
+    
+    boundaries = [(m.start(), m.end()) for m in _SENT_SPLIT.finditer(text)]
+    boundary_starts = [start for start, _ in boundaries]
+    
+    sentences = []
+    last_index = -1
+    for match in action_matches:
+        index = bisect.bisect_right(boundary_starts, match.start())
+        if index == last_index:
+            continue
+        last_index = index
+        start = boundaries[index - 1][1] if index > 0 else 0
+        end = boundaries[index][0] if index < len(boundaries) else len(text)
+        sentence = text[start:end].strip()
+        # Keep sentences that are directives or requests
+        if len(sentence) > 10 and len(sentence) < 200:
+            sentences.append(sentence)
+    return sentences
+
+
+def _last_sentence_break(text: str) -> Optional[re.Match]:
+    """
+    Return the last _SENT_SPLIT match in text, scanning backwards from the end
+    so only the tail of a long text is examined.
+    """
+    end = len(text)
+    while end > 0:
+        idx = max(text.rfind(".", 0, end), text.rfind("!", 0, end), text.rfind("?", 0, end))
+        if idx < 0:
+            return None
+        match = _SENT_SPLIT.match(text, idx)
+        if match:
+            return match
+        end = idx
+    return None
+
+
+# Child -> parent message: (kind, child agent name, body) with kind "report" or "question".
+# Kept structured until prompt rendering so categorising never scans message text.
+ChildMessage = Tuple[str, str, str]
+
+
+def _render_child_message(message: ChildMessage) -> str:
+    """Render a child message as it appears in the parent's prompt."""
+    kind, agent_name, body = message
+    if kind == "report":
+        return f"[{agent_name} Report]:\n{body}"
+    return f"[{agent_name} Question]: {body}"
+
+
+def _partition_child_messages(child_messages: List[ChildMessage]) -> Tuple[List[str], List[str]]:
+    """Split child messages into rendered (reports, questions) in a single pass."""
+    reports = []
+    questions = []
+    for message in child_messages:
+        if message[0] == "report":
+            reports.append(_render_child_message(message))
+        elif message[0] == "question":
+            questions.append(_render_child_message(message))
+    return reports, questions
+
 
 class AgentOrchestrator:
     """Orchestrates multi-agent graph execution."""
@@ -18,6 +185,10 @@ class AgentOrchestrator:
     def __init__(self, db: Session):
         self.db = db
         self.active_runs: Dict[str, RunModel] = {}
+        # Caps concurrent Gemini calls when a level fans out to many siblings
+        self._llm_sem = asyncio.Semaphore(settings.gemini_max_concurrency)
+        # Per-run cache of the input-independent part of each agent's context
+        self._context_shell_cache: Dict[str, str] = {}
     
     async def execute_run(
         self,
@@ -49,6 +220,9 @@ class AgentOrchestrator:
         self.db.commit()
         logger.info("orchestrator_run_status_updated", run_id=run_id, status="running")
         
+        # Agent configuration may have changed since the previous run
+        self._context_shell_cache.clear()
+        
         try:
             # Get session_id from run
             session_id = run.session_id if run else None
@@ -57,6 +231,8 @@ class AgentOrchestrator:
             # Load agent graph (within session)
             graph = self._load_agent_graph(root_agent_id, session_id)
             logger.info("orchestrator_graph_loaded", run_id=run_id, agent_count=len(graph))
+            # Parent -> children index so context building never goes back to the DB
+            children_by_parent = self._index_children(graph)
             
             yield {"type": "status", "agent_id": root_agent_id, "data": "running"}
             yield {"type": "log", "agent_id": root_agent_id, "data": f"✓ Starting hierarchical execution from root agent"}
@@ -78,7 +254,7 @@ class AgentOrchestrator:
             
             results = {}
             # Track child-to-parent communications
-            child_messages: Dict[str, List[str]] = {}  # parent_id -> list of child messages
+            child_messages: Dict[str, List[ChildMessage]] = defaultdict(list)  # parent_id -> list of child messages
             # Track which agents have been executed in this iteration
             executed_agents: Set[str] = set()
             
@@ -95,9 +271,17 @@ class AgentOrchestrator:
                 "data": f"[DEBUG] Agent hierarchy levels: {len(levels)} levels, Level 0: {[graph[aid].name for aid in levels[0]] if levels else 'empty'}",
             }
             
+            # The user's prompt does not change across iterations - only child messages do
+            root_base = self._root_base_input(input_data)
+            
+            # Child -> parent reports are only possible when some agent has children
+            has_reporting_children = len(levels) > 1
+            
             # Maximum iterations for bidirectional communication
             max_iterations = 5  # Increased from 3 to allow more back-and-forth
             iteration = 0
+            # Fingerprint of results after the previous iteration (to detect convergence)
+            last_results_fp: Optional[bytes] = None
             
             while iteration < max_iterations:
                 iteration += 1
@@ -118,6 +302,12 @@ class AgentOrchestrator:
                         "data": f"Executing level {level_num + 1} ({len(level_agents)} agent{'s' if len(level_agents) != 1 else ''})",
                     }
                     
+                    # Resolve parent names once per level for the debug logs below
+                    parent_names = {
+                        aid: (graph[graph[aid].parent_id].name if graph[aid].parent_id in graph else "Unknown")
+                        for aid in level_agents
+                    }
+                    
                     # Debug: Log which agents are at this level
                     if level_num == 0:
                         root_agent_at_level = graph.get(level_agents[0] if level_agents else None)
@@ -143,7 +333,7 @@ class AgentOrchestrator:
                         # Prepare input based on hierarchy and child messages
                         if level_num == 0:
                             # Root agent - ensure it gets the initial user input
-                            root_input = self._prepare_root_input(input_data, child_messages.get(root_agent_id))
+                            root_input = self._apply_child_messages(root_base, child_messages.get(root_agent_id))
                             agent_input = root_input
                             
                             # Log input for root agent with full details
@@ -164,13 +354,13 @@ class AgentOrchestrator:
                                     "data": f"[DEBUG] Root agent prompt: {input_data.get('prompt', 'N/A')[:200]}...",
                                 }
                         else:
-                            parent_output = results.get(agent.parent_id, "")
+                            parent_id = agent.parent_id
+                            parent_output = results.get(parent_id, "")
                             # Include any child messages this parent has received
-                            parent_messages = child_messages.get(agent.parent_id, [])
+                            parent_messages = child_messages.get(parent_id, [])
                             
                             # Log what we're getting from parent
-                            parent_agent = graph.get(agent.parent_id)
-                            parent_name = parent_agent.name if parent_agent else "Unknown"
+                            parent_name = parent_names[agent_id]
                             
                             yield {
                                 "type": "log",
@@ -189,8 +379,7 @@ class AgentOrchestrator:
                             # deeper levels will wait until their parent has produced output.
                             if not parent_output or len(parent_output.strip()) < 5:
                                 if level_num == 1:
-                                    seeded = self._prepare_root_input(input_data)
-                                    agent_input = self._prepare_agent_input(seeded, parent_messages)
+                                    agent_input = self._prepare_agent_input(root_base, parent_messages)
                                 else:
                                     agent_input = ""
                             else:
@@ -205,7 +394,7 @@ class AgentOrchestrator:
                                 yield {
                                     "type": "log",
                                     "agent_id": agent_id,
-                                    "data": f"[DEBUG] Child messages to {parent_name}: {parent_messages}",
+                                    "data": f"[DEBUG] Child messages to {parent_name}: {[_render_child_message(m) for m in parent_messages]}",
                                 }
                         
                         # Log execution start
@@ -216,7 +405,7 @@ class AgentOrchestrator:
                         }
                         
                         # Execute agent with Gemini
-                        output = ""
+                        output_chunks: List[str] = []
                         if not agent_input or len(agent_input.strip()) < 5:
                             yield {
                                 "type": "log",
@@ -228,8 +417,8 @@ class AgentOrchestrator:
                             if level_num > 1:
                                 results[agent_id] = ""
                                 run.output[agent_id] = ""
-                                self.db.commit()
                                 executed_agents.add(agent_id)
+                                self._commit_level()
                                 continue
                         else:
                             # Log that we're about to call Gemini
@@ -240,17 +429,16 @@ class AgentOrchestrator:
                             }
                         
                         try:
-                            chunk_count = 0
                             # Pass images only if agent has photo injection enabled
                             agent_images_for_execution = []
-                            if hasattr(agent, 'photo_injection_enabled') and agent.photo_injection_enabled == "true" and agent_images:
+                            if hasattr(agent, 'photo_injection_enabled') and agent.photo_injection_enabled and agent_images:
                                 agent_images_for_execution = agent_images
                             
+                            context = self._build_context(agent, agent_input, graph, children_by_parent)
                             async for chunk in self._execute_agent_streaming(
-                                agent, agent_input, api_key=api_key, images=agent_images_for_execution if agent_images_for_execution else None
+                                agent, agent_input, context, api_key=api_key, images=agent_images_for_execution if agent_images_for_execution else None
                             ):
-                                output += chunk
-                                chunk_count += 1
+                                output_chunks.append(chunk)
                                 # Stream root agent chunks only on FIRST iteration
                                 if level_num == 0 and iteration == 1:
                                     yield {
@@ -258,11 +446,12 @@ class AgentOrchestrator:
                                         "agent_id": agent_id,
                                         "data": chunk,
                                     }
+                            output = "".join(output_chunks)
                             
                             yield {
                                 "type": "log",
                                 "agent_id": agent_id,
-                                "data": f"[DEBUG] {agent.name} received {chunk_count} chunks from Gemini",
+                                "data": f"[DEBUG] {agent.name} received {len(output_chunks)} chunks from Gemini",
                             }
                         except Exception as e:
                             logger.error(f"Error executing {agent.name}: {e}")
@@ -275,7 +464,6 @@ class AgentOrchestrator:
                         
                         results[agent_id] = output
                         run.output[agent_id] = output
-                        self.db.commit()
                         
                         # Log output for debugging
                         yield {
@@ -312,6 +500,9 @@ class AgentOrchestrator:
                         }
                         
                         executed_agents.add(agent_id)
+                    
+                    # Persist the level's outputs in one transaction
+                    self._commit_level()
                 else:
                     # Multiple agents - execute in parallel
                     # Log execution start for all agents
@@ -323,67 +514,13 @@ class AgentOrchestrator:
                             "data": f"Executing {agent.name} (Level {level_num + 1})",
                         }
                     
-                    # Create tasks for parallel execution
-                    async def execute_and_collect_events(agent_id: str):
-                        """Execute agent and return events plus output."""
-                        agent = graph[agent_id]
-                        
-                        # Prepare input based on hierarchy and child messages
-                        if level_num == 0:
-                            agent_input = self._prepare_root_input(input_data, child_messages.get(agent_id))
-                            # Log will be handled outside parallel execution
-                        else:
-                            parent_output = results.get(agent.parent_id, "")
-                            # Include any child messages this parent has received
-                            parent_messages = child_messages.get(agent.parent_id, [])
-                            # Fallback seeding for first-level children; skip deeper levels
-                            if not parent_output or len(parent_output.strip()) < 5:
-                                if level_num == 1:
-                                    seeded = self._prepare_root_input(input_data)
-                                    agent_input = self._prepare_agent_input(seeded, parent_messages)
-                                else:
-                                    agent_input = ""
-                            else:
-                                agent_input = self._prepare_agent_input(parent_output, parent_messages)
-                        
-                        # Collect streaming chunks
-                        chunks = []
-                        if not agent_input or len(agent_input.strip()) < 5:
-                            # Skip execution for deeper levels with no usable input
-                            return {
-                                "agent_id": agent_id,
-                                "agent_name": agent.name,
-                                "output": "",
-                                "chunks": [],
-                            }
-                        
-                        # Pass images only if agent has photo injection enabled
-                        agent_images_for_execution = []
-                        if hasattr(agent, 'photo_injection_enabled') and agent.photo_injection_enabled == "true" and agent_images:
-                            agent_images_for_execution = agent_images
-                        
-                        async for chunk in self._execute_agent_streaming(
-                            agent, agent_input, api_key=api_key, images=agent_images_for_execution if agent_images_for_execution else None
-                        ):
-                            chunks.append(chunk)
-                        
-                        output = "".join(chunks)
-                        results[agent_id] = output
-                        run.output[agent_id] = output
-                        self.db.commit()
-                        
-                        return {
-                            "agent_id": agent_id,
-                            "agent_name": agent.name,
-                            "output": output,
-                            "chunks": chunks,
-                        }
+                    # Identical prompts at this level share a single Gemini call
+                    shared_calls: Dict[bytes, asyncio.Future] = {}
                     
                     # Log inputs for parallel agents
                     if level_num == 0:
                         for agent_id in level_agents:
-                            agent = graph[agent_id]
-                            agent_input = self._prepare_root_input(input_data, child_messages.get(agent_id))
+                            agent_input = self._apply_child_messages(root_base, child_messages.get(agent_id))
                             yield {
                                 "type": "log",
                                 "agent_id": agent_id,
@@ -392,11 +529,11 @@ class AgentOrchestrator:
                     else:
                         for agent_id in level_agents:
                             agent = graph[agent_id]
-                            parent_output = results.get(agent.parent_id, "")
-                            parent_messages = child_messages.get(agent.parent_id, [])
+                            parent_id = agent.parent_id
+                            parent_output = results.get(parent_id, "")
+                            parent_messages = child_messages.get(parent_id, [])
                             agent_input = self._prepare_agent_input(parent_output, parent_messages)
-                            parent_agent = graph.get(agent.parent_id)
-                            parent_name = parent_agent.name if parent_agent else "Unknown"
+                            parent_name = parent_names[agent_id]
                             yield {
                                 "type": "log",
                                 "agent_id": agent_id,
@@ -406,20 +543,31 @@ class AgentOrchestrator:
                                 yield {
                                     "type": "log",
                                     "agent_id": agent_id,
-                                    "data": f"[DEBUG] Child messages to {parent_name}: {parent_messages}",
+                                    "data": f"[DEBUG] Child messages to {parent_name}: {[_render_child_message(m) for m in parent_messages]}",
                         }
                     
-                    # Execute all agents in parallel
-                    tasks = [execute_and_collect_events(agent_id) for agent_id in level_agents]
-                    agent_results = await asyncio.gather(*tasks)
-                    
-                    # Yield events for each agent as they complete
-                    for result in agent_results:
+                    # Execute all agents in parallel, emitting events as each one finishes
+                    tasks = [
+                        self._execute_agent_node(
+                            agent_id, level_num, graph, children_by_parent, results, child_messages, run,
+                            root_base, shared_calls, api_key=api_key, agent_images=agent_images,
+                        )
+                        for agent_id in level_agents
+                    ]
+                    for next_result in asyncio.as_completed(tasks):
+                        result = await next_result
                         agent_id = result["agent_id"]
                         agent_name = result["agent_name"]
                         output = result["output"]
                         chunks = result["chunks"]
                         
+                        if result["deduplicated"]:
+                            yield {
+                                "type": "log",
+                                "agent_id": agent_id,
+                                "data": f"[DEBUG] {agent_name} reused the output of an identical sibling prompt",
+                            }
+                        
                         # Log output for debugging
                         yield {
                             "type": "log",
@@ -459,6 +607,26 @@ class AgentOrchestrator:
                             "agent_id": agent_id,
                             "data": f"Completed: {agent_name}",
                         }
+                    
+                    # This branch is the level loop's for-else, run once all levels finish;
+                    # persist its outputs in one transaction
+                    self._commit_level()
+                
+                # Stop once an iteration leaves every agent output unchanged -
+                # further iterations would just repeat the same calls
+                results_fp = hashlib.blake2b(json.dumps(results, sort_keys=True).encode(), digest_size=16).digest()
+                if iteration > 1 and results_fp == last_results_fp:
+                    yield {
+                        "type": "log",
+                        "agent_id": "",
+                        "data": f"[DEBUG] Outputs converged after iteration {iteration} - ending communication cycles",
+                    }
+                    break
+                last_results_fp = results_fp
+                
+                # A childless graph cannot produce child messages - skip the collection round
+                if not has_reporting_children:
+                    break
                 
                 # After all levels execute, allow children to communicate back to parents
                 if iteration < max_iterations:
@@ -480,7 +648,7 @@ class AgentOrchestrator:
                             yield {
                                 "type": "log",
                                 "agent_id": parent_id,
-                                "data": f"[DEBUG] Collected {len(messages)} message(s) for {parent_name}: {messages}",
+                                "data": f"[DEBUG] Collected {len(messages)} message(s) for {parent_name}: {[_render_child_message(m) for m in messages]}",
                             }
                     else:
                         yield {
@@ -500,8 +668,6 @@ class AgentOrchestrator:
                     
                     # Merge new messages into child_messages
                     for parent_id, messages in new_messages.items():
-                        if parent_id not in child_messages:
-                            child_messages[parent_id] = []
                         child_messages[parent_id].extend(messages)
                     
                     yield {
@@ -569,6 +735,14 @@ class AgentOrchestrator:
             yield {"type": "error", "agent_id": root_agent_id, "data": f"Execution failed: {str(e)} ({type(e).__name__})"}
             logger.info("orchestrator_run_marked_failed", run_id=run_id)
     
+    def _commit_level(self):
+        """Commit the pending writes of a finished level, rolling back on failure."""
+        try:
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+    
     def _load_agent_graph(self, root_agent_id: str, session_id: Optional[str] = None) -> Dict[str, AgentModel]:
         """Load entire agent graph starting from root (within session if provided)."""
         graph = {}
@@ -587,20 +761,39 @@ class AgentOrchestrator:
         
         graph[root_agent_id] = root
         
+        # Load the session's agents in one query and walk the subtree in memory
+        session_agents = self.db.query(AgentModel).filter(AgentModel.session_id == session_id).all()
+        children_by_parent: Dict[str, List[AgentModel]] = {}
+        for agent in session_agents:
+            if agent.parent_id:
+                children_by_parent.setdefault(agent.parent_id, []).append(agent)
+        
         # Recursively load children (within session)
-        self._load_children(root_agent_id, graph, session_id)
+        self._load_children(root_agent_id, graph, children_by_parent)
         
         return graph
     
-    def _load_children(self, parent_id: str, graph: Dict[str, AgentModel], session_id: Optional[str] = None):
-        """Recursively load child agents (within session if provided)."""
-        query = self.db.query(AgentModel).filter(AgentModel.parent_id == parent_id)
-        if session_id:
-            query = query.filter(AgentModel.session_id == session_id)
-        children = query.all()
-        for child in children:
+    def _load_children(
+        self,
+        parent_id: str,
+        graph: Dict[str, AgentModel],
+        children_by_parent: Dict[str, List[AgentModel]],
+    ):
+        """Recursively add child agents from the preloaded parent -> children index."""
+        for child in children_by_parent.get(parent_id, []):
+            if child.id in graph:
+                continue
             graph[child.id] = child
-            self._load_children(child.id, graph, session_id)
+            self._load_children(child.id, graph, children_by_parent)
+    
+    @staticmethod
+    def _index_children(graph: Dict[str, AgentModel]) -> Dict[str, List[AgentModel]]:
+        """Build a parent_id -> children index over the loaded graph."""
+        children_by_parent: Dict[str, List[AgentModel]] = defaultdict(list)
+        for agent in graph.values():
+            if agent.parent_id:
+                children_by_parent[agent.parent_id].append(agent)
+        return children_by_parent
     
     def _get_hierarchical_levels(
         self,
@@ -636,8 +829,12 @@ class AgentOrchestrator:
         
         return levels
     
-    def _prepare_root_input(self, root_input: Dict, child_messages: Optional[List[str]] = None) -> str:
+    def _prepare_root_input(self, root_input: Dict, child_messages: Optional[List[ChildMessage]] = None) -> str:
         """Prepare input for root agent from user's injected prompt and child messages."""
+        return self._apply_child_messages(self._root_base_input(root_input), child_messages)
+    
+    def _root_base_input(self, root_input: Dict) -> str:
+        """Extract the user's prompt from the run input (without child messages)."""
         # Extract the user's prompt/task from input_data
         if isinstance(root_input, dict):
             # Try multiple keys that might contain the user's prompt
@@ -668,58 +865,64 @@ class AgentOrchestrator:
         if not base_input or len(base_input.strip()) < 3:
             base_input = "Please process this request and delegate tasks to your child agents as needed."
         
-        # Add child messages if any (these come from previous iterations)
-        if child_messages:
-            # Separate reports from questions
-            reports = [msg for msg in child_messages if "[Report]" in msg]
-            questions = [msg for msg in child_messages if "[Question]" in msg]
-            
-            if reports:
-                # Child agents have completed their work - compile and organize
-                reports_text = "\n\n".join(reports)
-                base_input += f"\n\n=== WORK COMPLETED BY YOUR CHILD AGENTS ===\n{reports_text}"
-                base_input += "\n\n=== YOUR TASK ===\n"
-                base_input += "Your child agents have completed their research and provided you with their findings. "
-                base_input += "Please compile, organize, and synthesize all of this information into a comprehensive, well-structured response for the user. "
-                base_input += "Compartmentalize the information by category (e.g., flights, activities, timing, costs) and present organized findings. "
-                base_input += "Make sure the final response is clear, actionable, and addresses the user's original request."
-            
-            if questions:
-                # Child agents have questions - address them first
-                questions_text = "\n\n".join(questions)
-                base_input += f"\n\n=== QUESTIONS FROM YOUR CHILD AGENTS ===\n{questions_text}"
-                base_input += "\n\nPlease address these questions and provide clear guidance to your child agents."
-            
-            if not reports and not questions:
-                # Fallback: just show all messages
-                messages_text = "\n\n".join(child_messages)
-                base_input += f"\n\n=== MESSAGES FROM YOUR CHILD AGENTS ===\n{messages_text}"
-                base_input += "\n\nPlease review these messages and respond appropriately."
-        
         return base_input
     
-    def _prepare_agent_input(self, parent_output: str, child_messages: Optional[List[str]] = None) -> str:
+    @staticmethod
+    def _apply_child_messages(base_input: str, child_messages: Optional[List[ChildMessage]] = None) -> str:
+        """Append child messages (from previous iterations) to the root agent's base input."""
+        if not child_messages:
+            return base_input
+        
+        parts = [base_input]
+        
+        # Separate reports from questions
+        reports, questions = _partition_child_messages(child_messages)
+        
+        if reports:
+            # Child agents have completed their work - compile and organize
+            reports_text = "\n\n".join(reports)
+            parts.append(f"\n\n=== WORK COMPLETED BY YOUR CHILD AGENTS ===\n{reports_text}")
+            parts.append("\n\n=== YOUR TASK ===\n")
+            parts.append("Your child agents have completed their research and provided you with their findings. ")
+            parts.append("Please compile, organize, and synthesize all of this information into a comprehensive, well-structured response for the user. ")
+            parts.append("Compartmentalize the information by category (e.g., flights, activities, timing, costs) and present organized findings. ")
+            parts.append("Make sure the final response is clear, actionable, and addresses the user's original request.")
+        
+        if questions:
+            # Child agents have questions - address them first
+            questions_text = "\n\n".join(questions)
+            parts.append(f"\n\n=== QUESTIONS FROM YOUR CHILD AGENTS ===\n{questions_text}")
+            parts.append("\n\nPlease address these questions and provide clear guidance to your child agents.")
+        
+        if not reports and not questions:
+            # Fallback: just show all messages
+            messages_text = "\n\n".join(_render_child_message(m) for m in child_messages)
+            parts.append(f"\n\n=== MESSAGES FROM YOUR CHILD AGENTS ===\n{messages_text}")
+            parts.append("\n\nPlease review these messages and respond appropriately.")
+        
+        return "".join(parts)
+    
+    def _prepare_agent_input(self, parent_output: str, child_messages: Optional[List[ChildMessage]] = None) -> str:
         """Prepare input for agent from parent output and child messages."""
         # Extract intent/goals from parent output instead of passing raw output
-        input_text = self._extract_intent_from_parent(parent_output)
+        parts = [self._extract_intent_from_parent(parent_output)]
         
         # Add child messages if any (only for parents receiving child outputs)
         if child_messages:
             # Separate reports from questions
-            reports = [msg for msg in child_messages if "[Report]" in msg]
-            questions = [msg for msg in child_messages if "[Question]" in msg]
+            reports, questions = _partition_child_messages(child_messages)
             
             if reports:
                 reports_text = "\n\n".join(reports)
-                input_text += f"\n\n=== WORK COMPLETED BY YOUR CHILD AGENTS ===\n{reports_text}"
-                input_text += "\n\nPlease compile and organize this information into your final response."
+                parts.append(f"\n\n=== WORK COMPLETED BY YOUR CHILD AGENTS ===\n{reports_text}")
+                parts.append("\n\nPlease compile and organize this information into your final response.")
             
             if questions:
                 questions_text = "\n\n".join(questions)
-                input_text += f"\n\n=== QUESTIONS FROM YOUR CHILD AGENTS ===\n{questions_text}"
-                input_text += "\n\nPlease address these questions."
+                parts.append(f"\n\n=== QUESTIONS FROM YOUR CHILD AGENTS ===\n{questions_text}")
+                parts.append("\n\nPlease address these questions.")
         
-        return input_text
+        return "".join(parts)
     
     def _extract_intent_from_parent(self, parent_output: str) -> str:
         """
@@ -733,67 +936,47 @@ class AgentOrchestrator:
         if not parent_output or len(parent_output.strip()) < 10:
             return parent_output
         
-        import re
-        
         # Step 1: Extract key entities (modular - works for any domain)
         entities = {
-            "locations": [],
+            "locations": set(),
             "dates": [],
             "numbers": [],
             "keywords": [],
         }
         
-        # Extract locations (common patterns: "to X", "in X", "at X", "X and Y")
-        location_patterns = [
-            r'\bto\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b',
-            r'\bin\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b',
-            r'\bat\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b',
-            r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s+and\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b',
-        ]
-        for pattern in location_patterns:
-            matches = re.findall(pattern, parent_output)
-            for match in matches:
-                if isinstance(match, tuple):
-                    entities["locations"].extend([m for m in match if m])
-                else:
-                    entities["locations"].append(match)
+        # Cheap pre-checks: location patterns need a capital letter, date/number patterns a digit
+        has_upper = not parent_output.islower()
+        has_digit = _DIGIT_PATTERN.search(parent_output) is not None
         
-        # Extract dates (flexible date patterns)
-        date_patterns = [
-            r'\b(january|february|march|april|may|june|july|august|september|october|november|december)\s+\d{1,2}\b',
-            r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b',
-            r'\b\d{4}-\d{2}-\d{2}\b',
-            r'\b(spring|summer|fall|autumn|winter)\s+\d{4}\b',
-        ]
-        for pattern in date_patterns:
-            entities["dates"].extend(re.findall(pattern, parent_output, re.IGNORECASE))
+        if has_upper:
+            # Extract locations
+            for pattern in _LOC_PATTERNS:
+                for match in islice(pattern.finditer(parent_output), _ENTITY_MATCH_CAP):
+                    # Deduplicate and drop short fragments as locations are collected
+                    for location in match.groups():
+                        location = location.strip()
+                        if len(location) > 2:
+                            entities["locations"].add(location)
         
-        # Extract numbers (prices, quantities, etc.)
-        entities["numbers"] = re.findall(r'\$\d+(?:,\d{3})*(?:\.\d{2})?|\d+(?:,\d{3})*', parent_output)
-        
-        # Step 2: Extract action verbs and directives (domain-agnostic)
-        action_indicators = [
-            r'\b(?:please|can you|could you|I need|I want|help|find|search|get|compile|research|analyze|create|plan|book|schedule|recommend|look for|provide|give|show)\b',
-        ]
+        if has_digit:
+            # Extract dates
+            for pattern in _DATE_PATTERNS:
+                for match in islice(pattern.finditer(parent_output), _ENTITY_MATCH_CAP):
+                    entities["dates"].append(match.group(1) if pattern.groups else match.group())
+            
+            # Extract numbers (only the first three are reported)
+            entities["numbers"] = [match.group() for match in islice(_NUM_PATTERN.finditer(parent_output), 3)]
         
-        # Extract sentences containing action verbs
-        sentences = re.split(r'[.!?]\s+', parent_output)
-        action_sentences = []
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if any(re.search(pattern, sentence, re.IGNORECASE) for pattern in action_indicators):
-                # Keep sentences that are directives or requests
-                if len(sentence) > 10 and len(sentence) < 200:
-                    action_sentences.append(sentence)
+        # Step 2: Extract sentences containing action verbs and directives
+        action_sentences = _action_sentences(parent_output)
         
         # Step 3: Build structured intent (modular format)
         intent_parts = []
         
         # Add extracted entities
         if entities["locations"]:
-            unique_locs = list(set([loc.strip() for loc in entities["locations"] if len(loc.strip()) > 2]))
-            if unique_locs:
-                intent_parts.append(f"Location(s): {', '.join(unique_locs[:5])}")
+            unique_locs = list(entities["locations"])
+            intent_parts.append(f"Location(s): {', '.join(unique_locs[:5])}")
         
         if entities["dates"]:
             unique_dates = list(set(entities["dates"]))
@@ -805,31 +988,33 @@ class AgentOrchestrator:
         
         # Step 4: Combine into structured task
         if intent_parts or action_sentences:
-            task_description = ""
+            task_parts = []
             
             # Add key information
             if intent_parts:
-                task_description = "Key information from parent:\n" + "\n".join(intent_parts) + "\n\n"
+                task_parts.extend(["Key information from parent:\n", "\n".join(intent_parts), "\n\n"])
             
             # Add action directives (most relevant first)
             if action_sentences:
                 # Prioritize shorter, more direct sentences
                 action_sentences.sort(key=len)
-                task_description += "Task: " + ". ".join(action_sentences[:2]) + "\n\n"
+                task_parts.extend(["Task: ", ". ".join(action_sentences[:2]), "\n\n"])
             
             # Add context for clarity
-            task_description += "Context: " + parent_output[:200] + ("..." if len(parent_output) > 200 else "")
-            task_description += "\n\nUse the information above to complete your task. If you need clarification, ask your parent using [QUESTION: ...]"
+            task_parts.extend(["Context: ", parent_output[:200], "..." if len(parent_output) > 200 else ""])
+            task_parts.append("\n\nUse the information above to complete your task. If you need clarification, ask your parent using [QUESTION: ...]")
             
-            return task_description
+            return "".join(task_parts)
         
         # Fallback: Smart summary that preserves intent
         # If output is long, create a focused summary
         if len(parent_output) > 300:
             # Take first and last sentences (often contain the most important info)
-            all_sentences = re.split(r'[.!?]\s+', parent_output)
-            if len(all_sentences) > 2:
-                summary = all_sentences[0] + ". ... " + all_sentences[-1]
+            # Locate just the first and last sentence breaks instead of splitting everything
+            first_break = _SENT_SPLIT.search(parent_output)
+            last_break = _last_sentence_break(parent_output) if first_break else None
+            if last_break and last_break.start() > first_break.start():
+                summary = parent_output[:first_break.start()] + ". ... " + parent_output[last_break.end():]
             else:
                 summary = parent_output[:300]
             
@@ -839,11 +1024,104 @@ class AgentOrchestrator:
         return parent_output
     
     
+    async def _execute_agent_node(
+        self,
+        agent_id: str,
+        level_num: int,
+        graph: Dict[str, AgentModel],
+        children_by_parent: Dict[str, List[AgentModel]],
+        results: Dict[str, str],
+        child_messages: Dict[str, List[ChildMessage]],
+        run: RunModel,
+        root_base: str,
+        shared_calls: Dict[bytes, asyncio.Future],
+        api_key: Optional[str] = None,
+        agent_images: Optional[List[str]] = None,
+    ) -> Dict:
+        """Execute one agent of a parallel level and return its output plus chunks."""
+        agent = graph[agent_id]
+        
+        # Prepare input based on hierarchy and child messages
+        if level_num == 0:
+            agent_input = self._apply_child_messages(root_base, child_messages.get(agent_id))
+            # Log will be handled outside parallel execution
+        else:
+            parent_id = agent.parent_id
+            parent_output = results.get(parent_id, "")
+            # Include any child messages this parent has received
+            parent_messages = child_messages.get(parent_id, [])
+            # Fallback seeding for first-level children; skip deeper levels
+            if not parent_output or len(parent_output.strip()) < 5:
+                if level_num == 1:
+                    agent_input = self._prepare_agent_input(root_base, parent_messages)
+                else:
+                    agent_input = ""
+            else:
+                agent_input = self._prepare_agent_input(parent_output, parent_messages)
+        
+        if not agent_input or len(agent_input.strip()) < 5:
+            # Skip execution for deeper levels with no usable input
+            return {
+                "agent_id": agent_id,
+                "agent_name": agent.name,
+                "output": "",
+                "chunks": [],
+                "deduplicated": False,
+            }
+        
+        # Pass images only if agent has photo injection enabled
+        agent_images_for_execution = []
+        if hasattr(agent, 'photo_injection_enabled') and agent.photo_injection_enabled and agent_images:
+            agent_images_for_execution = agent_images
+        
+        # Collect streaming chunks, reusing an in-flight call for an identical prompt
+        context = self._build_context(agent, agent_input, graph, children_by_parent)
+        call_key = self._llm_call_key(agent, context)
+        call = shared_calls.get(call_key)
+        deduplicated = call is not None
+        if call is None:
+            call = asyncio.ensure_future(self._collect_agent_chunks(
+                agent, agent_input, context, api_key, agent_images_for_execution if agent_images_for_execution else None
+            ))
+            shared_calls[call_key] = call
+        chunks = await call
+        
+        output = "".join(chunks)
+        results[agent_id] = output
+        run.output[agent_id] = output
+        
+        return {
+            "agent_id": agent_id,
+            "agent_name": agent.name,
+            "output": output,
+            "chunks": chunks,
+            "deduplicated": deduplicated,
+        }
+    
+    async def _collect_agent_chunks(
+        self,
+        agent: AgentModel,
+        agent_input: str,
+        context: str,
+        api_key: Optional[str] = None,
+        images: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Run one Gemini streaming call and collect its chunks."""
+        chunks = []
+        async with self._llm_sem:
+            async for chunk in self._execute_agent_streaming(
+                agent, agent_input, context, api_key=api_key, images=images
+            ):
+                chunks.append(chunk)
+        return chunks
+    
     async def _execute_agent_with_events(
         self,
         agent: AgentModel,
         agent_id: str,
         level_num: int,
+        graph: Dict[str, AgentModel],
+        children_by_parent: Dict[str, List[AgentModel]],
         results: Dict[str, str],
         input_data: Dict,
         run: RunModel,
@@ -856,15 +1134,14 @@ class AgentOrchestrator:
             parent_output = results.get(agent.parent_id, "")
             agent_input = parent_output
         
-        # Execute agent with Gemini
-        output = ""
-        async for chunk in self._execute_agent_streaming(agent, agent_input):
-            output += chunk
+        # Execute agent with Gemini (bounded by the shared semaphore, so callers can gather a level)
+        context = self._build_context(agent, agent_input, graph, children_by_parent)
+        chunks = await self._collect_agent_chunks(agent, agent_input, context)
+        output = "".join(chunks)
         
-        # Store result
+        # Store result (committed by the caller once the level finishes)
         results[agent_id] = output
         run.output[agent_id] = output
-        self.db.commit()
         
         return output
     
@@ -872,6 +1149,7 @@ class AgentOrchestrator:
         self,
         agent: AgentModel,
         input_data: str,
+        context: str,
         api_key: Optional[str] = None,
         images: Optional[List[str]] = None,
     ) -> AsyncGenerator[str, None]:
@@ -901,12 +1179,7 @@ class AgentOrchestrator:
             # Update agent parameters in database
             if agent.parameters:
                 agent.parameters["model"] = model
-                from sqlalchemy.orm.attributes import flag_modified
-                flag_modified(agent, "parameters")  # Force SQLAlchemy to detect JSON change
-                self.db.commit()
-        
-        # Build context
-        context = self._build_context(agent, input_data)
+                flag_modified(agent, "parameters")  # Force SQLAlchemy to detect JSON change (committed with the level)
         
         # Generate with streaming
         async for chunk in generate_streaming(
@@ -919,19 +1192,32 @@ class AgentOrchestrator:
         ):
             yield chunk
     
+    @staticmethod
+    def _llm_call_key(agent: AgentModel, context: str) -> bytes:
+        """Fingerprint of everything that determines an agent's Gemini call."""
+        key = hashlib.blake2b(digest_size=16)
+        for part in (
+            agent.system_prompt or "",
+            context,
+            json.dumps(agent.parameters or {}, sort_keys=True, default=str),
+        ):
+            key.update(part.encode())
+            key.update(b"\0")
+        return key.digest()
+    
     async def _collect_child_messages(
         self,
         graph: Dict[str, AgentModel],
         levels: List[List[str]],
         results: Dict[str, str],
         executed_agents: Set[str],
-    ) -> Dict[str, List[str]]:
+    ) -> Dict[str, List[ChildMessage]]:
         """
         Collect outputs from child agents to their parents.
         Children send their complete work outputs to parents, and optionally questions.
         Parents compile these outputs into organized final responses.
         """
-        child_messages: Dict[str, List[str]] = {}
+        child_messages: Dict[str, List[ChildMessage]] = defaultdict(list)
         
         # Process levels from bottom to top (reverse order)
         for level_num in range(len(levels) - 1, -1, -1):
@@ -948,12 +1234,8 @@ class AgentOrchestrator:
                 if agent.parent_id and agent_output:
                     # Always send the complete output from child to parent
                     # This allows parent to compile all child work
-                    if agent.parent_id not in child_messages:
-                        child_messages[agent.parent_id] = []
-                    
-                    # Format child output for parent
-                    child_output_message = f"[{agent.name} Report]:\n{agent_output}"
-                    child_messages[agent.parent_id].append(child_output_message)
+                    # Rendered into the parent's prompt only when its input is prepared
+                    child_messages[agent.parent_id].append(("report", agent.name, agent_output))
                     
                     logger.info(
                         "child_output_sent_to_parent",
@@ -967,9 +1249,7 @@ class AgentOrchestrator:
                     question = self._extract_child_message(agent_output)
                     if question and question != agent_output:
                         # If there's a specific question (not just the full output), add it separately
-                        child_messages[agent.parent_id].append(
-                            f"[{agent.name} Question]: {question}"
-                        )
+                        child_messages[agent.parent_id].append(("question", agent.name, question))
         
         return child_messages
     
@@ -983,36 +1263,30 @@ class AgentOrchestrator:
             return None
         
         # Look for explicit markers (highest priority)
-        markers = [
-            ("[QUESTION:", "]"),
-            ("[REQUEST:", "]"),
-            ("[MESSAGE:", "]"),
-            ("[ASK:", "]"),
-            ("Question for parent:", None),
-            ("Request to parent:", None),
-            ("Message to parent:", None),
-            ("I need help:", None),
-            ("Can you clarify:", None),
-            ("Need clarification:", None),
-        ]
+        # Single scan recording where each marker first ends; every marker contains
+        # a colon, so plain prose without one skips the regex entirely
+        marker_ends: Dict[int, int] = {}
+        if ":" in output:
+            for match in _CHILD_MARKER_RE.finditer(output):
+                marker_ends.setdefault(match.lastindex - 1, match.end())
         
-        for marker, closing in markers:
-            marker_lower = marker.lower()
-            if marker_lower in output.lower():
+        for marker_index, (marker, closing) in enumerate(_CHILD_MARKERS):
+            if marker_index in marker_ends:
                 # Extract content after marker
-                idx = output.lower().find(marker_lower)
-                message = output[idx + len(marker):].strip()
+                message = output[marker_ends[marker_index]:].strip()
                 
                 # Remove closing bracket if present
                 if closing and message.startswith(closing):
                     message = message[len(closing):].strip()
-                elif closing and closing in message:
-                    # Find and remove closing bracket
+                elif closing:
+                    # Find and remove closing bracket (one find covers the membership test)
                     closing_idx = message.find(closing)
-                    message = message[:closing_idx].strip()
+                    if closing_idx >= 0:
+                        message = message[:closing_idx].strip()
                 
                 # Clean up common prefixes
-                if message.lower().startswith("to parent:"):
+                # Only the prefix is lowercased, not the whole remaining output
+                if message[:len("to parent:")].lower() == "to parent:":
                     message = message[len("to parent:"):].strip()
                 
                 if message and len(message) > 5:  # Ensure meaningful message
@@ -1021,70 +1295,69 @@ class AgentOrchestrator:
         # Look for question patterns in short outputs
         if len(output) < 300:
             # Check if it's a direct question
-            question_indicators = ["?", "can you", "could you", "should I", "what", "how", "why", "when", "where"]
-            if any(indicator in output.lower() for indicator in question_indicators):
-                # Extract the question part (usually the last sentence)
-                sentences = output.split(".")
-                questions = [s.strip() + "?" for s in sentences if "?" in s]
-                if questions:
-                    return questions[-1].strip("?")
+            if _QUESTION_RE.search(output) is not None:
+                # Extract the question part (usually the last sentence): the "."-delimited
+                # segment holding the last "?", found without splitting the whole output
+                question_idx = output.rfind("?")
+                if question_idx >= 0:
+                    segment_start = output.rfind(".", 0, question_idx) + 1
+                    segment_end = output.find(".", question_idx)
+                    if segment_end < 0:
+                        segment_end = len(output)
+                    return (output[segment_start:segment_end].strip() + "?").strip("?")
                 return output
         
         # If no explicit marker found, return None (child doesn't need to communicate)
         return None
     
-    def _build_context(self, agent: AgentModel, input_data: str) -> str:
+    def _build_context(
+        self,
+        agent: AgentModel,
+        input_data: str,
+        graph: Dict[str, AgentModel],
+        children_by_parent: Dict[str, List[AgentModel]],
+    ) -> str:
         """Build context string for agent execution."""
-        context = f"Input: {input_data}"
+        shell = self._context_shell_cache.get(agent.id)
+        if shell is None:
+            shell = self._build_context_shell(agent, graph, children_by_parent)
+            self._context_shell_cache[agent.id] = shell
+        return f"Input: {input_data}" + shell
+    
+    def _build_context_shell(
+        self,
+        agent: AgentModel,
+        graph: Dict[str, AgentModel],
+        children_by_parent: Dict[str, List[AgentModel]],
+    ) -> str:
+        """Build the part of an agent's context that does not depend on its input."""
+        parts = []
         
         # Add photo injection capabilities if enabled
-        if hasattr(agent, 'photo_injection_enabled') and agent.photo_injection_enabled == "true":
-            context += "\n\n=== PHOTO INJECTION CAPABILITIES ==="
-            context += "\nYou have been configured to accept and process images. Users can upload photos directly to you."
+        if hasattr(agent, 'photo_injection_enabled') and agent.photo_injection_enabled:
             if hasattr(agent, 'photo_injection_features') and agent.photo_injection_features:
-                features_text = ", ".join(agent.photo_injection_features)
-                context += f"\nYour custom photo processing features: {features_text}"
-                context += "\nUse these capabilities to analyze images and provide insights based on your configured features."
+                capabilities = _PHOTO_FEATURES_TEMPLATE.format(features=", ".join(agent.photo_injection_features))
             else:
-                context += "\nYou can analyze images, extract information, identify objects, read text, and provide detailed visual analysis."
-            context += "\nWhen images are provided, they will be included along with the text prompt."
+                capabilities = _PHOTO_DEFAULT_CAPABILITIES
+            parts.append(_PHOTO_CONTEXT_TEMPLATE.format(capabilities=capabilities))
         
         # Add information about child agents if this agent has children
-        children = self.db.query(AgentModel).filter(
-            AgentModel.parent_id == agent.id
-        ).all()
+        children = children_by_parent.get(agent.id, ())
         
         if children:
-            child_names = [child.name for child in children]
-            context += f"\n\nYou have child agents that can help you: {', '.join(child_names)}"
-            context += "\nYou can delegate tasks to them by providing clear instructions about what you need."
-            context += "\nIMPORTANT: When delegating to child agents, be specific about what you want them to do."
-            context += "\nExample: Instead of just passing along the full context, say 'Please find flights to [destination] for [dates]' or 'Search for activities in [location]'."
-            context += "\n\nWhen your child agents complete their work, they will send you their complete findings as reports."
-            context += "\nYour job is to compile, organize, and synthesize all their findings into a comprehensive, well-structured response."
-            context += "\nCompartmentalize information by category and present organized findings to address the user's original request."
-            context += "\nYour child agents may ask you questions using markers like [QUESTION: ...] or [REQUEST: ...]"
+            parts.append(_CHILDREN_CONTEXT_TEMPLATE.format(names=", ".join(child.name for child in children)))
         
         # Add information about parent if this agent has one
         if agent.parent_id:
-            parent = self.db.query(AgentModel).filter(AgentModel.id == agent.parent_id).first()
+            parent = graph.get(agent.parent_id)
             if parent:
-                context += f"\n\nYou are a child agent of {parent.name}."
-                context += "\nYour parent has given you a task. Try to understand what they want you to do and proceed accordingly."
-                context += "\nWhen you complete your work, provide a comprehensive report with your findings, research, and recommendations."
-                context += "\nYour complete output will be sent back to your parent agent, who will compile all child agent reports into a final organized response."
-                context += "\nIf the task is unclear or you need more information, you can ask your parent using:"
-                context += "\n- [QUESTION: your question here]"
-                context += "\n- [REQUEST: your request here]"
-                context += "\n- [MESSAGE: your message here]"
-                context += "\nHowever, try to infer what you can from the context and proceed with reasonable assumptions when possible."
-                context += "\nProvide thorough, detailed work - your parent will organize and present it to the user."
+                parts.append(_PARENT_CONTEXT_TEMPLATE.format(parent_name=parent.name))
         
         # Add tool context if agent has tools
         if agent.tools:
             tool_descriptions = [f"- {tool.get('name', 'unknown')}" for tool in agent.tools]
-            context += f"\n\nAvailable tools: {', '.join(tool_descriptions)}"
+            parts.append(f"\n\nAvailable tools: {', '.join(tool_descriptions)}")
         
-        return context
+        return "".join(parts)
     
 
@@ -1,33 +1,51 @@
 """
 New message-based orchestrator with explicit communication and validation.
 """
-from typing import Dict, List, Optional, AsyncGenerator
+from typing import Dict, List, Optional, AsyncGenerator, Tuple
+from contextlib import nullcontext
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, UTC
 import asyncio
+import re
 
 from db.schemas import RunModel, AgentModel
-from core.messages import (
-    Message, DelegateMessage, ReportMessage, QueryMessage, AnswerMessage,
-    RequestUserInputMessage, UserResponseMessage, AgentMailbox, AgentState,
-    MessageValidator, MessageType
-)
+from core.messages import AgentMailbox, AgentState
 from core.agent_selector import AgentSelector
-from core.gemini_client import generate_streaming
+from core.gemini_client import generate_streaming, get_prompt_cache
 from core.agent_tree_cache import get_agent_tree_cache
 from core.logging import get_logger
+from core.settings import settings
 
 logger = get_logger("orchestrator_v2")
 
+# Explicit delegation markers in a parent's output: "[DELEGATE to <name>:" and "@<name>:"
+_DELEGATE_TO_RE = re.compile(r"\[DELEGATE to ([^:\[\n]+):")
+_AT_MENTION_RE = re.compile(r"@([^:@\n]+):")
+
+
+def _utcnow() -> datetime:
+    """Current UTC time as a naive datetime, matching the DateTime columns."""
+    return datetime.now(UTC).replace(tzinfo=None)
+
 
 class AgentExecutor:
     """Executes individual agents with their context."""
     
-    def __init__(self, agent: AgentModel, api_key: str, images: Optional[List[str]] = None):
+    def __init__(
+        self,
+        agent: AgentModel,
+        api_key: str,
+        images: Optional[List[str]] = None,
+        llm_semaphore: Optional[asyncio.Semaphore] = None,
+    ):
         self.agent = agent
         self.api_key = api_key
         self.mailbox = AgentMailbox(agent.id)
         self.images = images or []
+        # Shared with sibling executors to bound concurrent Gemini streams
+        self.llm_semaphore = llm_semaphore
+        # Invariant prompt header, built on first use (root executes twice: task + synthesis)
+        self._prompt_header: Optional[str] = None
         
     async def execute(
         self,
@@ -39,25 +57,30 @@ class AgentExecutor:
         
         Yields events for streaming to frontend.
         """
+        # Bound once: every event repeats it, and the ORM attribute goes through a descriptor
+        agent_id = self.agent.id
+        
         self.mailbox.set_state(AgentState.ANALYZING)
         yield {
             "type": "status",
-            "agent_id": self.agent.id,
+            "agent_id": agent_id,
             "data": "analyzing"
         }
         yield {
             "type": "log",
-            "agent_id": self.agent.id,
+            "agent_id": agent_id,
             "data": f"[{self.agent.name}] Analyzing task..."
         }
         
-        # Build system prompt
+        # Build system prompt; per-call parent context goes in the user turn so the
+        # system prompt stays identical across executions and its cache is reused
         system_prompt = self._build_system_prompt(context)
+        user_input = self._build_user_input(task, context)
         
         self.mailbox.set_state(AgentState.EXECUTING)
         yield {
             "type": "status",
-            "agent_id": self.agent.id,
+            "agent_id": agent_id,
             "data": "executing"
         }
         
@@ -84,39 +107,44 @@ class AgentExecutor:
                 )
                 model = model_migration[model]
             
-            # Stream agent output
-            full_output = ""
-            async for chunk in generate_streaming(
-                system_prompt=system_prompt,
-                user_input=task,
-                model=model,
-                temperature=temperature,
-                api_key=self.api_key,
-                images=self._images_for_agent()
-            ):
-                full_output += chunk
-                yield {
-                    "type": "output_chunk",
-                    "agent_id": self.agent.id,
-                    "data": chunk
-                }
+            # Stream agent output, joining the chunks once at the end
+            chunks: List[str] = []
+            async with (self.llm_semaphore or nullcontext()):
+                # Long system prompts are cached by Gemini and reused across calls/runs
+                cached_prompt = await get_prompt_cache(system_prompt, model, self.api_key)
+                
+                async for chunk in generate_streaming(
+                    system_prompt=system_prompt,
+                    user_input=user_input,
+                    model=model,
+                    temperature=temperature,
+                    api_key=self.api_key,
+                    images=self._images_for_agent(),
+                    cached_content=cached_prompt
+                ):
+                    chunks.append(chunk)
+                    yield {
+                        "type": "output_chunk",
+                        "agent_id": agent_id,
+                        "data": chunk
+                    }
             
             # Agent completed successfully
             self.mailbox.set_state(AgentState.COMPLETED)
             yield {
                 "type": "output",
-                "agent_id": self.agent.id,
-                "data": full_output
+                "agent_id": agent_id,
+                "data": "".join(chunks)
             }
             yield {
                 "type": "status",
-                "agent_id": self.agent.id,
+                "agent_id": agent_id,
                 "data": "completed"
             }
             
             yield {
                 "type": "log",
-                "agent_id": self.agent.id,
+                "agent_id": agent_id,
                 "data": f"[{self.agent.name}] ✓ Completed"
             }
             
@@ -125,21 +153,18 @@ class AgentExecutor:
             logger.error("agent_execution_error", agent_id=self.agent.id, error=str(e))
             yield {
                 "type": "error",
-                "agent_id": self.agent.id,
+                "agent_id": agent_id,
                 "data": f"Error: {str(e)}"
             }
             yield {
                 "type": "status",
-                "agent_id": self.agent.id,
+                "agent_id": agent_id,
                 "data": "error"
             }
     
     def _agent_supports_images(self) -> bool:
         """Return True if this agent allows photo injection."""
-        value = getattr(self.agent, "photo_injection_enabled", False)
-        if isinstance(value, str):
-            return value.lower() == "true"
-        return bool(value)
+        return bool(getattr(self.agent, "photo_injection_enabled", False))
     
     def _images_for_agent(self) -> Optional[List[str]]:
         """Pass images only when agent supports it."""
@@ -149,10 +174,32 @@ class AgentExecutor:
     
     def _build_system_prompt(self, context: Optional[Dict] = None) -> str:
         """Build system prompt for the agent."""
+        if self._prompt_header is None:
+            self._prompt_header = self._build_prompt_header()
+        prompt = self._prompt_header
+        
+        if context and context.get('child_agents'):
+            prompt += f"""
+YOUR CHILD AGENTS (they will be automatically invoked if needed):
+{context['child_agents']}
+
+When you provide your response, if you mention needing help from a child agent, they will be automatically delegated to and their results will be incorporated. You don't need to wait - just provide your analysis and recommendations, and the system will ensure child agents contribute.
+"""
+        
+        return prompt
+    
+    def _build_user_input(self, task: str, context: Optional[Dict] = None) -> str:
+        """Build the user turn, prefixing the task with the parent's context."""
+        if context and context.get('parent_message'):
+            return f"Context from parent:\n{context['parent_message']}\n\nTask:\n{task}"
+        return task
+    
+    def _build_prompt_header(self) -> str:
+        """Build the context-independent start of the system prompt."""
         # Use the agent's system_prompt as the base, with communication protocol added
         base_prompt = self.agent.system_prompt or f"You are {self.agent.name}, a {self.agent.role}."
         
-        prompt = f"""{base_prompt}
+        return f"""{base_prompt}
 
 IMPORTANT INSTRUCTIONS:
 - Make decisions autonomously based on best practices and your expertise
@@ -161,34 +208,6 @@ IMPORTANT INSTRUCTIONS:
 - Provide complete, actionable responses with specific recommendations
 
 """
-        
-        if context:
-            prompt += f"\nContext from parent:\n{context.get('parent_message', '')}\n"
-            if context.get('child_agents'):
-                prompt += f"""
-YOUR CHILD AGENTS (they will be automatically invoked if needed):
-{context['child_agents']}
-
-When you provide your response, if you mention needing help from a child agent, they will be automatically delegated to and their results will be incorporated. You don't need to wait - just provide your analysis and recommendations, and the system will ensure child agents contribute.
-"""
-        
-        return prompt
-    
-    def _extract_user_request(self, output: str) -> str:
-        """Extract user input request from output."""
-        if "[REQUEST_USER_INPUT:" in output:
-            start = output.index("[REQUEST_USER_INPUT:") + len("[REQUEST_USER_INPUT:")
-            end = output.index("]", start)
-            return output[start:end].strip()
-        return "Additional information needed"
-    
-    def _extract_parent_query(self, output: str) -> str:
-        """Extract parent query from output."""
-        if "[QUERY_PARENT:" in output:
-            start = output.index("[QUERY_PARENT:") + len("[QUERY_PARENT:")
-            end = output.index("]", start)
-            return output[start:end].strip()
-        return "Need clarification"
 
 
 class MessageBasedOrchestrator:
@@ -199,6 +218,15 @@ class MessageBasedOrchestrator:
         self.executors: Dict[str, AgentExecutor] = {}
         self.agent_outputs: Dict[str, str] = {}
         self.final_output: Optional[str] = None
+        # Bounds how many sibling agents stream from Gemini at the same time
+        self._child_sem = asyncio.Semaphore(settings.max_parallel_children)
+        # parent_id -> children for the run's session, loaded in one query
+        self._children_by_parent: Dict[str, List[AgentModel]] = {}
+        self._children_session_id: Optional[str] = None
+        # Formatted capability listings keyed by the ordered child ids
+        self._capabilities_cache: Dict[Tuple[str, ...], str] = {}
+        # Parent output -> (DELEGATE-to index, @-mention index), each child name -> task start
+        self._delegation_index_cache: Dict[str, Tuple[Dict[str, int], Dict[str, int]]] = {}
         
     async def execute_run(
         self,
@@ -228,8 +256,8 @@ class MessageBasedOrchestrator:
         
         # Update run status
         run.status = "running"
-        run.started_at = datetime.utcnow()
-        self.db.commit()
+        run.started_at = _utcnow()
+        await asyncio.to_thread(self.db.commit)
         
         try:
             session_id = run.session_id
@@ -244,6 +272,9 @@ class MessageBasedOrchestrator:
                 yield {"type": "error", "data": "Root agent not found"}
                 return
             
+            # Index the whole session's agents by parent so recursion never queries per agent
+            self._preload_children(session_id)
+            
             yield {
                 "type": "log",
                 "agent_id": root_agent_id,
@@ -277,7 +308,7 @@ class MessageBasedOrchestrator:
             yield {
                 "type": "log",
                 "agent_id": root_agent_id,
-                "data": f"✓ Available agents: {', '.join([tree_snapshot.capability_map.agent_name] + [c.agent_name for c in tree_snapshot.capability_map.children])}"
+                "data": f"✓ Available agents: {tree_snapshot.available_agents_summary()}"
             }
             
             # Phase 2: Decide delegation strategy
@@ -329,7 +360,7 @@ class MessageBasedOrchestrator:
             # Build context for root
             context = {}
             if selected_children:
-                context["child_agents"] = AgentSelector.format_agent_capabilities(selected_children)
+                context["child_agents"] = self._format_capabilities(selected_children)
             
             # Execute root agent
             async for event in root_executor.execute(user_task, context):
@@ -349,7 +380,7 @@ class MessageBasedOrchestrator:
                     "data": f"👥 Phase 4: Executing {len(selected_children)} child agent(s) recursively..."
                 }
                 
-                # Execute children RECURSIVELY (they can invoke their own children)
+                # Execute children RECURSIVELY and concurrently (they can invoke their own children)
                 for child in selected_children:
                     yield {
                         "type": "delegation",
@@ -365,18 +396,17 @@ class MessageBasedOrchestrator:
                         "agent_id": child.id,
                         "data": f"▶️  Starting {child.name}..."
                     }
-                    
-                    # Execute child recursively (will handle its own children)
-                    async for event in self._execute_agent_recursively(
-                        agent=child,
-                        task=user_task,
-                        parent_output=self.agent_outputs.get(root_agent_id, ""),
-                        session_id=session_id,
-                        api_key=api_key,
-                        depth=1,
-                        images=images
-                    ):
-                        yield event
+                
+                async for event in self._execute_children_concurrently(
+                    children=selected_children,
+                    task=user_task,
+                    parent_output=self.agent_outputs.get(root_agent_id, ""),
+                    session_id=session_id,
+                    api_key=api_key,
+                    depth=1,
+                    images=images
+                ):
+                    yield event
                 
                 # Phase 5: Root synthesizes results
                 yield {
@@ -385,20 +415,18 @@ class MessageBasedOrchestrator:
                     "data": "🔄 Phase 5: Synthesizing results from all levels..."
                 }
                 
-                # Build synthesis prompt
-                child_reports = "\n\n".join([
-                    f"{child.name} Report:\n{self.agent_outputs.get(child.id, 'No output')}"
-                    for child in selected_children
-                ])
-                
-                synthesis_task = f"""Based on the following reports from your team, provide a final comprehensive response to the user.
-
-Original request: {user_task}
-
-Team reports:
-{child_reports}
-
-Provide a synthesized, coherent response:"""
+                # Build synthesis prompt: reports go straight into one part list and are
+                # joined once, rather than joined into a block that is then copied again
+                synthesis_parts: List[str] = [
+                    "Based on the following reports from your team, provide a final comprehensive response to the user.\n\n"
+                    "Original request: ", user_task, "\n\nTeam reports:\n"
+                ]
+                for i, child in enumerate(selected_children):
+                    if i:
+                        synthesis_parts.append("\n\n")
+                    synthesis_parts.extend((child.name, " Report:\n", self.agent_outputs.get(child.id, "No output")))
+                synthesis_parts.append("\n\nProvide a synthesized, coherent response:")
+                synthesis_task = "".join(synthesis_parts)
                 
                 # Execute synthesis
                 async for event in root_executor.execute(synthesis_task, {}):
@@ -413,8 +441,8 @@ Provide a synthesized, coherent response:"""
                 "final": final_response,
                 "agents": self.agent_outputs,
             }
-            run.finished_at = datetime.utcnow()
-            self.db.commit()
+            run.finished_at = _utcnow()
+            await asyncio.to_thread(self.db.commit)
             
             yield {
                 "type": "status",
@@ -428,9 +456,26 @@ Provide a synthesized, coherent response:"""
             logger.error("orchestrator_v2_error", run_id=run_id, error=str(e), exc_info=True)
             run.status = "failed"
             run.error = str(e)
-            run.finished_at = datetime.utcnow()
-            self.db.commit()
+            run.finished_at = _utcnow()
+            await asyncio.to_thread(self.db.commit)
             yield {"type": "error", "data": f"Execution failed: {str(e)}"}
+        
+        finally:
+            self._release_run_state()
+    
+    def _release_run_state(self) -> None:
+        """
+        Drop per-run executors, outputs and indexes so a reused orchestrator
+        holds nothing from finished runs.
+        
+        Outputs are rebound rather than cleared: run.output still references the
+        finished run's dict.
+        """
+        self.executors = {}
+        self.agent_outputs = {}
+        self._children_by_parent = {}
+        self._children_session_id = None
+        self._delegation_index_cache.clear()
     
     async def _execute_agent_recursively(
         self,
@@ -462,10 +507,10 @@ Provide a synthesized, coherent response:"""
         }
         
         if children:
-            context["child_agents"] = AgentSelector.format_agent_capabilities(children)
+            context["child_agents"] = self._format_capabilities(children)
         
         # Execute this agent
-        agent_executor = AgentExecutor(agent, api_key, images)
+        agent_executor = AgentExecutor(agent, api_key, images, llm_semaphore=self._child_sem)
         self.executors[agent.id] = agent_executor
         
         delegation_task = self._extract_delegation_for_child(
@@ -504,43 +549,144 @@ Provide a synthesized, coherent response:"""
                     "agent_id": child.id,
                     "data": f"  {'  ' * (depth + 1)}▶️  {child.name} executing..."
                 }
-                
-                # RECURSIVE CALL - child can invoke its children
-                async for child_event in self._execute_agent_recursively(
-                    agent=child,
-                    task=task,
-                    parent_output=agent_output,
-                    session_id=session_id,
-                    api_key=api_key,
-                    depth=depth + 1,
-                    images=images
-                ):
-                    yield child_event
+            
+            # RECURSIVE CALL - children run concurrently and can invoke their children
+            async for child_event in self._execute_children_concurrently(
+                children=children,
+                task=task,
+                parent_output=agent_output,
+                session_id=session_id,
+                api_key=api_key,
+                depth=depth + 1,
+                images=images
+            ):
+                yield child_event
+    
+    async def _execute_children_concurrently(
+        self,
+        children: List[AgentModel],
+        task: str,
+        parent_output: str,
+        session_id: str,
+        api_key: str,
+        depth: int,
+        images: Optional[List[str]] = None
+    ) -> AsyncGenerator[Dict, None]:
+        """
+        Execute sibling agents concurrently, yielding their events as they arrive.
+        Concurrent Gemini streams are bounded by self._child_sem.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        tasks = [
+            asyncio.create_task(self._drain_child_events(
+                queue, child, task, parent_output, session_id, api_key, depth, images
+            ))
+            for child in children
+        ]
+        try:
+            pending = len(tasks)
+            while pending:
+                kind, item = await queue.get()
+                if kind == "done":
+                    pending -= 1
+                else:
+                    yield item
+            # Surface any exception raised inside a child subtree
+            await asyncio.gather(*tasks)
+        finally:
+            for child_task in tasks:
+                if not child_task.done():
+                    child_task.cancel()
+    
+    async def _drain_child_events(
+        self,
+        queue: asyncio.Queue,
+        child: AgentModel,
+        task: str,
+        parent_output: str,
+        session_id: str,
+        api_key: str,
+        depth: int,
+        images: Optional[List[str]] = None
+    ):
+        """Run one child subtree and forward its events to the shared queue."""
+        try:
+            async for event in self._execute_agent_recursively(
+                agent=child,
+                task=task,
+                parent_output=parent_output,
+                session_id=session_id,
+                api_key=api_key,
+                depth=depth,
+                images=images
+            ):
+                await queue.put(("event", event))
+        finally:
+            await queue.put(("done", child.id))
     
     def _extract_delegation_for_child(self, root_output: str, child_name: str, original_task: str) -> str:
         """Extract or generate delegation task for a child."""
-        # Look for explicit delegation in root output
-        delegation_markers = [
-            f"[DELEGATE to {child_name}:",
-            f"@{child_name}:",
-            f"{child_name}, please"
-        ]
+        # Look for explicit delegation in root output (markers in priority order)
+        delegate_to, at_mentions = self._delegation_index(root_output)
+        start = delegate_to.get(child_name)
+        if start is None:
+            start = at_mentions.get(child_name)
+        if start is None:
+            marker = f"{child_name}, please"
+            marker_idx = root_output.find(marker)
+            if marker_idx >= 0:
+                start = marker_idx + len(marker)
         
-        for marker in delegation_markers:
-            if marker in root_output:
-                # Extract the delegation
-                start = root_output.index(marker) + len(marker)
-                # Find end (next newline or end of string)
-                end = root_output.find("\n", start)
-                if end == -1:
-                    end = len(root_output)
-                return root_output[start:end].strip()
+        if start is not None:
+            # Find end (next newline or end of string)
+            end = root_output.find("\n", start)
+            if end == -1:
+                end = len(root_output)
+            return root_output[start:end].strip()
         
         # Fallback: Use original task
         return f"Help with: {original_task}"
     
+    def _delegation_index(self, root_output: str) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """
+        Index the named delegation markers of a parent's output in one scan per marker
+        type, so every sibling resolves its task with a dict lookup.
+        """
+        index = self._delegation_index_cache.get(root_output)
+        if index is None:
+            delegate_to: Dict[str, int] = {}
+            for match in _DELEGATE_TO_RE.finditer(root_output):
+                delegate_to.setdefault(match.group(1), match.end())
+            at_mentions: Dict[str, int] = {}
+            for match in _AT_MENTION_RE.finditer(root_output):
+                at_mentions.setdefault(match.group(1), match.end())
+            index = (delegate_to, at_mentions)
+            self._delegation_index_cache[root_output] = index
+        return index
+    
+    def _format_capabilities(self, agents: List[AgentModel]) -> str:
+        """Format a capability listing once per distinct set of agents in this run."""
+        key = tuple(agent.id for agent in agents)
+        formatted = self._capabilities_cache.get(key)
+        if formatted is None:
+            formatted = AgentSelector.format_agent_capabilities(agents)
+            self._capabilities_cache[key] = formatted
+        return formatted
+    
+    def _preload_children(self, session_id: str):
+        """Load every agent of a session once and index them by parent."""
+        children_by_parent: Dict[str, List[AgentModel]] = {}
+        for agent in self.db.query(AgentModel).filter(AgentModel.session_id == session_id).all():
+            if agent.parent_id:
+                children_by_parent.setdefault(agent.parent_id, []).append(agent)
+        self._children_by_parent = children_by_parent
+        self._children_session_id = session_id
+    
     def _load_children(self, parent_id: str, session_id: str) -> List[AgentModel]:
         """Load child agents for a parent."""
+        if session_id == self._children_session_id:
+            return self._children_by_parent.get(parent_id, [])
+        
         children = self.db.query(AgentModel).filter(
             AgentModel.parent_id == parent_id,
             AgentModel.session_id == session_id
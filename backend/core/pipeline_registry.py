@@ -1,17 +1,35 @@
 """In-memory registry for agent pipeline awareness and capabilities."""
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Set
+from collections import deque
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Set, Tuple
 import re
+import sys
+import threading
 
-from sqlalchemy.orm import Session
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
 
+from db.database import SessionLocal
 from db.schemas import AgentModel
 from core.logging import get_logger
 
 
 logger = get_logger("pipeline_registry")
 
+# Separators between capability tokens (anything outside the token alphabet)
+_TOKEN_SPLIT_RE = re.compile(r"[^a-zA-Z0-9_-]+")
+
+
+class _RegistrySnapshot(NamedTuple):
+    """Immutable bundle of the registry indexes built by one refresh."""
+
+    id_to_agent: Dict[str, AgentModel]
+    parent_to_children: Dict[str, Tuple[str, ...]]
+    child_to_parent: Dict[str, str]
+    capability_terms_by_agent: Dict[str, FrozenSet[str]]
+    term_to_agents: Dict[str, Set[str]]
+
 
 class PipelineRegistry:
     """Caches agent topology and lightweight capability metadata.
@@ -24,9 +42,29 @@ class PipelineRegistry:
     _instance: Optional["PipelineRegistry"] = None
 
     def __init__(self) -> None:
-        self.id_to_agent: Dict[str, AgentModel] = {}
-        self.parent_to_children: Dict[str, List[str]] = {}
-        self.capability_terms_by_agent: Dict[str, Set[str]] = {}
+        # Readers take one reference to the current snapshot; refresh() publishes a new
+        # one with a single attribute assignment, so no read ever sees a half-built registry
+        self._snapshot = _RegistrySnapshot({}, {}, {}, {}, {})
+        # Serialises concurrent refreshers only; readers never lock
+        self._refresh_lock = threading.Lock()
+        # Incremental updates only make sense on top of a full refresh
+        self._loaded = False
+
+    @property
+    def id_to_agent(self) -> Dict[str, AgentModel]:
+        return self._snapshot.id_to_agent
+
+    @property
+    def parent_to_children(self) -> Dict[str, Tuple[str, ...]]:
+        return self._snapshot.parent_to_children
+
+    @property
+    def capability_terms_by_agent(self) -> Dict[str, FrozenSet[str]]:
+        return self._snapshot.capability_terms_by_agent
+
+    @property
+    def term_to_agents(self) -> Dict[str, Set[str]]:
+        return self._snapshot.term_to_agents
 
     @classmethod
     def instance(cls) -> "PipelineRegistry":
@@ -35,60 +73,126 @@ class PipelineRegistry:
         return cls._instance
 
     def refresh(self, db: Session) -> None:
-        """Rebuild registry from database."""
-        agents: List[AgentModel] = db.query(AgentModel).all()
-        self.id_to_agent = {a.id: a for a in agents}
-        self.parent_to_children = {}
-        for agent in agents:
-            if agent.parent_id:
-                self.parent_to_children.setdefault(agent.parent_id, []).append(agent.id)
-        # Ensure keys for all agents exist
-        for agent in agents:
-            self.parent_to_children.setdefault(agent.id, [])
-
-        # Build capability term sets
-        self.capability_terms_by_agent = {}
-        for agent in agents:
-            terms: Set[str] = set()
-            # Role and system prompt keywords
-            terms.update(self._tokenize(agent.role))
-            terms.update(self._tokenize(agent.system_prompt))
-            # Tools
-            for tool in (agent.tools or []):
-                name = tool.get("name") if isinstance(tool, dict) else None
-                if name:
-                    terms.update(self._tokenize(name))
-            # Photo features
-            for feat in (agent.photo_injection_features or []):
-                terms.update(self._tokenize(str(feat)))
-
-            # Keep only alpha-ish tokens with length >= 3
-            filtered = {t for t in terms if len(t) >= 3 and re.match(r"^[a-zA-Z0-9_-]+$", t)}
-            self.capability_terms_by_agent[agent.id] = filtered
+        """Rebuild registry from database and publish it as a new snapshot."""
+        with self._refresh_lock:
+            agents: List[AgentModel] = db.query(AgentModel).all()
+            id_to_agent = {a.id: a for a in agents}
+            children_lists: Dict[str, List[str]] = {}
+            for agent in agents:
+                if agent.parent_id:
+                    children_lists.setdefault(agent.parent_id, []).append(agent.id)
+            # Ensure keys for all agents exist; tuples keep the published graph immutable
+            parent_to_children: Dict[str, Tuple[str, ...]] = {
+                aid: tuple(cids) for aid, cids in children_lists.items()
+            }
+            for agent in agents:
+                parent_to_children.setdefault(agent.id, ())
+
+            child_to_parent = {a.id: a.parent_id for a in agents if a.parent_id}
+
+            # Build capability term sets
+            capability_terms_by_agent: Dict[str, FrozenSet[str]] = {
+                agent.id: self._capability_terms(agent) for agent in agents
+            }
+
+            # Inverted index: capability term -> ids of agents that have it
+            term_to_agents: Dict[str, Set[str]] = {}
+            for aid, terms in capability_terms_by_agent.items():
+                for term in terms:
+                    term_to_agents.setdefault(term, set()).add(aid)
+
+            self._snapshot = _RegistrySnapshot(
+                id_to_agent, parent_to_children, child_to_parent, capability_terms_by_agent, term_to_agents
+            )
+            self._loaded = True
 
         logger.info(
             "pipeline_registry_refreshed",
-            total_agents=len(self.id_to_agent),
-            total_edges=sum(len(v) for v in self.parent_to_children.values()),
+            total_agents=len(id_to_agent),
+            total_edges=sum(len(v) for v in parent_to_children.values()),
         )
 
+    def apply_agent_changes(self, changes: List[Tuple[str, AgentModel]]) -> None:
+        """Apply committed agent inserts/updates/deletes without re-reading the database.
+
+        Work is proportional to the changed agents: the snapshot dicts are copied
+        shallowly and only the touched entries (and term sets) are rebuilt, then the
+        result is published like a refresh.
+        """
+        if any(op == "stale" for op, _ in changes):
+            # A bulk statement (such as the subtree delete) changed agents the events
+            # never saw; rebuild from a fresh session, the committing one can't query
+            if self._loaded:
+                with SessionLocal() as db:
+                    self.refresh(db)
+            return
+        with self._refresh_lock:
+            if not self._loaded:
+                return
+            snapshot = self._snapshot
+            id_to_agent = dict(snapshot.id_to_agent)
+            parent_to_children = dict(snapshot.parent_to_children)
+            child_to_parent = dict(snapshot.child_to_parent)
+            capability_terms_by_agent = dict(snapshot.capability_terms_by_agent)
+            term_to_agents = dict(snapshot.term_to_agents)
+
+            for op, agent in changes:
+                aid = agent.id
+                # Detach the old version: parent edge and inverted-index entries
+                old_parent = child_to_parent.pop(aid, None)
+                if old_parent is not None and old_parent in parent_to_children:
+                    parent_to_children[old_parent] = tuple(
+                        cid for cid in parent_to_children[old_parent] if cid != aid
+                    )
+                for term in capability_terms_by_agent.pop(aid, ()):
+                    # Term sets are shared with the published snapshot; replace, never mutate
+                    remaining = term_to_agents.get(term, set()) - {aid}
+                    if remaining:
+                        term_to_agents[term] = remaining
+                    else:
+                        term_to_agents.pop(term, None)
+
+                if op == "delete":
+                    id_to_agent.pop(aid, None)
+                    parent_to_children.pop(aid, None)
+                    continue
+
+                id_to_agent[aid] = agent
+                parent_to_children.setdefault(aid, ())
+                if agent.parent_id:
+                    child_to_parent[aid] = agent.parent_id
+                    parent_to_children[agent.parent_id] = parent_to_children.get(agent.parent_id, ()) + (aid,)
+                terms = self._capability_terms(agent)
+                capability_terms_by_agent[aid] = terms
+                for term in terms:
+                    term_to_agents[term] = term_to_agents.get(term, set()) | {aid}
+
+            self._snapshot = _RegistrySnapshot(
+                id_to_agent, parent_to_children, child_to_parent, capability_terms_by_agent, term_to_agents
+            )
+
+        logger.debug("pipeline_registry_updated", changed_agents=len(changes))
+
     def get_children(self, parent_id: str) -> List[str]:
-        return list(self.parent_to_children.get(parent_id, []))
+        return list(self.parent_to_children.get(parent_id, ()))
 
     def get_graph_from_root(self, root_id: str) -> Dict[str, AgentModel]:
+        snapshot = self._snapshot
         graph: Dict[str, AgentModel] = {}
-        if root_id not in self.id_to_agent:
+        if root_id not in snapshot.id_to_agent:
             return graph
-        def dfs(aid: str) -> None:
+        # Iterative walk: no per-node call frames and no recursion limit on deep trees
+        stack = deque([root_id])
+        while stack:
+            aid = stack.pop()
             if aid in graph:
-                return
-            agent = self.id_to_agent.get(aid)
+                continue
+            agent = snapshot.id_to_agent.get(aid)
             if not agent:
-                return
+                continue
             graph[aid] = agent
-            for cid in self.parent_to_children.get(aid, []):
-                dfs(cid)
-        dfs(root_id)
+            # Reversed so children pop in order, giving the same pre-order as the recursive walk
+            stack.extend(reversed(snapshot.parent_to_children.get(aid, ())))
         return graph
 
     def select_relevant_children(self, parent_id: str, context_text: str, fallback_all_if_empty: bool = True) -> List[str]:
@@ -96,27 +200,93 @@ class PipelineRegistry:
 
         If no child passes the threshold and fallback is True, return all children to avoid dead-ends.
         """
-        children = self.get_children(parent_id)
+        snapshot = self._snapshot
+        children = list(snapshot.parent_to_children.get(parent_id, ()))
         if not children:
             return []
-        context_terms = self._tokenize(context_text)
-        scores: List[tuple[str, int]] = []
-        for cid in children:
-            agent_terms = self.capability_terms_by_agent.get(cid, set())
-            score = len(agent_terms.intersection(context_terms))
-            scores.append((cid, score))
+        # Agents sharing at least one term with the context, via the inverted index
+        matched: Set[str] = set()
+        for term in self._tokenize(context_text):
+            matched.update(snapshot.term_to_agents.get(term, ()))
         # Keep children with score >= 1
-        relevant = [cid for cid, s in scores if s >= 1]
+        relevant = [cid for cid in children if cid in matched]
         if not relevant and fallback_all_if_empty:
             return children
         return relevant
 
+    @classmethod
+    def _capability_terms(cls, agent: AgentModel) -> FrozenSet[str]:
+        terms: Set[str] = set()
+        # Role and system prompt keywords
+        terms.update(cls._tokenize(agent.role))
+        terms.update(cls._tokenize(agent.system_prompt))
+        # Tools
+        for tool in (agent.tools or []):
+            name = tool.get("name") if isinstance(tool, dict) else None
+            if name:
+                terms.update(cls._tokenize(name))
+        # Photo features
+        for feat in (agent.photo_injection_features or []):
+            terms.update(cls._tokenize(str(feat)))
+        return frozenset(terms)
+
     @staticmethod
     def _tokenize(text: Optional[str]) -> Set[str]:
         if not text:
             return set()
-        # Lowercase and split on non-word
-        tokens = re.split(r"[^a-zA-Z0-9_-]+", text.lower())
-        return {t for t in tokens if t}
+        # Lowercase and split on non-word; the split already limits tokens to the
+        # token alphabet, so only the minimum length (>= 3) needs checking.
+        # Interned so agents sharing a term share one string object.
+        tokens = _TOKEN_SPLIT_RE.split(text.lower())
+        return {sys.intern(t) for t in tokens if len(t) >= 3}
+
+
+# Keep the registry in step with agent writes. Mapper events fire inside the flush,
+# before the transaction is decided, so changes are parked on the ORM session and
+# applied only once it commits. Session hooks are scoped to the app's SessionLocal
+# sessions rather than every Session. The hooks register when a consumer imports this
+# module, and apply nothing until that consumer's first refresh().
+_PENDING_KEY = "pipeline_registry_changes"
+
+
+def _queue_agent_change(op: str, target: AgentModel) -> None:
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, []).append((op, target))
+
+
+@event.listens_for(AgentModel, "after_insert")
+def _agent_inserted(mapper, connection, target) -> None:
+    _queue_agent_change("insert", target)
+
+
+@event.listens_for(AgentModel, "after_update")
+def _agent_updated(mapper, connection, target) -> None:
+    _queue_agent_change("update", target)
+
+
+@event.listens_for(AgentModel, "after_delete")
+def _agent_deleted(mapper, connection, target) -> None:
+    _queue_agent_change("delete", target)
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _agent_bulk_write(orm_execute_state) -> None:
+    # Bulk UPDATE/DELETE statements bypass the mapper events above
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is AgentModel:
+        orm_execute_state.session.info.setdefault(_PENDING_KEY, []).append(("stale", None))
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _apply_agent_changes(session: Session) -> None:
+    changes = session.info.pop(_PENDING_KEY, None)
+    if changes:
+        PipelineRegistry.instance().apply_agent_changes(changes)
 
 
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_agent_changes(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -1,20 +1,36 @@
 """
 Recursive delegation engine for multi-level agent communication.
 """
-from typing import List, Dict, Optional, AsyncGenerator
-from sqlalchemy.orm import Session
+from typing import List, Dict, Optional, AsyncGenerator, Set, Tuple
+from collections import OrderedDict
+from sqlalchemy import select
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.orm.attributes import set_committed_value
+from datetime import datetime
 import asyncio
 
 from db.schemas import AgentModel
 from core.delegation import (
     DelegationRequest, DelegationResponse, DelegationStatus,
-    AgentCapability, CircuitBreaker, ResponseAggregator
+    AgentCapability, ResponseAggregator, DelegationRejected, GLOBAL_BREAKER
 )
-from core.gemini_client import generate_streaming
+from core.gemini_client import generate_streaming, generate_text
 from core.logging import get_logger
+from core.settings import settings
 
 logger = get_logger("recursive_delegator")
 
+# Max remembered can-handle verdicts per delegator; least recently used are evicted
+_CAN_HANDLE_CACHE_SIZE = 1024
+# Fixed tail of the can-handle prompt, after the request task
+_CAN_HANDLE_SUFFIX = """
+
+Respond with ONLY "YES" or "NO".
+- YES if the agent can handle this directly
+- NO if they need to delegate to specialists"""
+# A child fulfilling with at least this confidence ends the race; siblings are cancelled
+_EARLY_ACCEPT_CONFIDENCE = 0.7
+
 
 class RecursiveDelegator:
     """
@@ -23,11 +39,61 @@ class RecursiveDelegator:
     Any agent can delegate to its children, who can delegate to their children, etc.
     """
     
-    def __init__(self, db: Session, api_key: str):
+    def __init__(self, db: Session, api_key: str, emit_logs: bool = True):
         self.db = db
         self.api_key = api_key
-        self.circuit_breaker = CircuitBreaker()
+        # Callers that don't stream "log" events to a client can turn them off, which
+        # skips building their message strings on every recursion step
+        self.emit_logs = emit_logs
+        self.circuit_breaker = GLOBAL_BREAKER
         self.active_requests: Dict[str, DelegationRequest] = {}
+        # Caps in-flight Gemini calls across the whole delegation tree; children recurse
+        # through this same instance, so every level shares it
+        self._llm_sem = asyncio.Semaphore(settings.gemini_max_concurrency)
+        # parent_id -> children for every subtree loaded so far (one query per subtree)
+        self._children_by_parent: Dict[str, List[AgentModel]] = {}
+        # Agents whose children are all in _children_by_parent, and the session they
+        # were filtered by
+        self._loaded_parents: Set[str] = set()
+        self._children_session_id: Optional[str] = None
+        self._load_lock = asyncio.Lock()
+        # (agent id, hash of task + capabilities) -> verdict future; pending while the
+        # LLM call is in flight so concurrent sibling checks share it
+        self._can_handle_cache: "OrderedDict[Tuple[str, int], asyncio.Future]" = OrderedDict()
+        # agent id -> (updated_at the prefix was built from, can-handle prompt prefix)
+        self._can_handle_prefixes: Dict[str, Tuple[Optional[datetime], str]] = {}
+    
+    def _rejection_events(
+        self,
+        agent: AgentModel,
+        request: DelegationRequest,
+        status: DelegationStatus,
+        error_message: str,
+        log_message: str
+    ) -> List[Dict]:
+        """Warning log plus terminal delegation_response for a request rejected up front."""
+        events = []
+        if self.emit_logs:
+            events.append({
+                "type": "log",
+                "agent_id": agent.id,
+                "data": f"⚠️ [{agent.name}] {log_message}"
+            })
+        events.append({
+            "type": "delegation_response",
+            "agent_id": agent.id,
+            "response": DelegationResponse(
+                request_id=request.request_id,
+                responding_agent_id=agent.id,
+                status=status,
+                error_message=error_message
+            )
+        })
+        return events
+    
+    def clear_can_handle_cache(self) -> None:
+        """Forget memoized can-handle verdicts (e.g. at a session boundary)."""
+        self._can_handle_cache.clear()
     
     async def delegate_recursive(
         self,
@@ -41,19 +107,8 @@ class RecursiveDelegator:
         Yields events for streaming to frontend.
         Final event has type "delegation_response" with the DelegationResponse.
         """
-        yield {
-            "type": "log",
-            "agent_id": agent.id,
-            "data": f"[{agent.name}] Received delegation request"
-        }
-        
-        # Validation checks
-        if request.has_cycle():
-            yield {
-                "type": "log",
-                "agent_id": agent.id,
-                "data": f"⚠️ [{agent.name}] Cycle detected in path: {request.path}"
-            }
+        # Fail fast: an open breaker answers before any other work, with no log noise
+        if not self.circuit_breaker.should_try(agent.id):
             yield {
                 "type": "delegation_response",
                 "agent_id": agent.id,
@@ -61,90 +116,58 @@ class RecursiveDelegator:
                     request_id=request.request_id,
                     responding_agent_id=agent.id,
                     status=DelegationStatus.ERROR,
-                    error_message=f"Cycle detected: {request.path}"
+                    error_message="Circuit breaker open"
                 )
             }
             return
         
-        if request.exceeds_depth():
+        if self.emit_logs:
             yield {
                 "type": "log",
                 "agent_id": agent.id,
-                "data": f"⚠️ [{agent.name}] Max depth exceeded ({request.max_hops} hops)"
-            }
-            yield {
-                "type": "delegation_response",
-                "agent_id": agent.id,
-                "response": DelegationResponse(
-                    request_id=request.request_id,
-                    responding_agent_id=agent.id,
-                    status=DelegationStatus.ERROR,
-                    error_message=f"Max depth exceeded: {request.max_hops} hops"
-                )
+                "data": f"[{agent.name}] Received delegation request"
             }
-            return
         
+        # Cycles and depth are ruled out when a request is built (see forward_to);
+        # only the time-dependent check remains here
         if request.is_expired():
-            yield {
-                "type": "log",
-                "agent_id": agent.id,
-                "data": f"⚠️ [{agent.name}] Request timeout ({request.timeout}s)"
-            }
-            yield {
-                "type": "delegation_response",
-                "agent_id": agent.id,
-                "response": DelegationResponse(
-                    request_id=request.request_id,
-                    responding_agent_id=agent.id,
-                    status=DelegationStatus.TIMEOUT,
-                    error_message=f"Timeout after {request.timeout}s"
-                )
-            }
+            for event in self._rejection_events(
+                agent, request, DelegationStatus.TIMEOUT,
+                f"Timeout after {request.timeout}s",
+                f"Request timeout ({request.timeout}s)"
+            ):
+                yield event
             return
         
-        # Check circuit breaker
-        if not self.circuit_breaker.should_try(agent.id):
-            yield {
-                "type": "log",
-                "agent_id": agent.id,
-                "data": f"⚠️ [{agent.name}] Circuit breaker open, skipping"
-            }
-            yield {
-                "type": "delegation_response",
-                "agent_id": agent.id,
-                "response": DelegationResponse(
-                    request_id=request.request_id,
-                    responding_agent_id=agent.id,
-                    status=DelegationStatus.ERROR,
-                    error_message="Circuit breaker open"
-                )
-            }
-            return
+        # Bound once per node; every log line below carries the same trace context
+        log = logger.bind(agent_id=agent.id, request_id=request.request_id, depth=len(request.path))
         
         # Track active request
         self.active_requests[request.request_id] = request
         
         try:
             # Phase 1: Try to handle directly
-            yield {
-                "type": "log",
-                "agent_id": agent.id,
-                "data": f"🤔 [{agent.name}] Analyzing if I can handle this..."
-            }
-            
-            can_handle = await self._check_can_handle(agent, request)
-            
-            if can_handle:
-                # Execute directly
+            if self.emit_logs:
                 yield {
                     "type": "log",
                     "agent_id": agent.id,
-                    "data": f"✓ [{agent.name}] I can handle this directly"
+                    "data": f"🤔 [{agent.name}] Analyzing if I can handle this..."
                 }
+            
+            can_handle = await self._check_can_handle(agent, request, log)
+            
+            if can_handle:
+                # Execute directly
+                if self.emit_logs:
+                    yield {
+                        "type": "log",
+                        "agent_id": agent.id,
+                        "data": f"✓ [{agent.name}] I can handle this directly"
+                    }
                 
-                response = await self._execute_agent_for_request(agent, request)
+                response = await self._execute_agent_for_request(agent, request, log)
                 
-                async for event in response["events"]:
+                for event in response["events"]:
                     yield event
                 
                 final_response = response["response"]
@@ -162,21 +185,23 @@ class RecursiveDelegator:
                 return
             
             # Phase 2: Can't handle directly - try children
-            yield {
-                "type": "log",
-                "agent_id": agent.id,
-                "data": f"🔍 [{agent.name}] Can't handle directly, checking children..."
-            }
-            
-            children = self._load_children(agent.id, request.context.get("session_id"))
-            
-            if not children:
-                # Leaf node - can't help
+            if self.emit_logs:
                 yield {
                     "type": "log",
                     "agent_id": agent.id,
-                    "data": f"❌ [{agent.name}] No children available, cannot fulfill"
+                    "data": f"🔍 [{agent.name}] Can't handle directly, checking children..."
                 }
+            
+            children = await self._load_children(agent.id, request.context.get("session_id"))
+            
+            if not children:
+                # Leaf node - can't help
+                if self.emit_logs:
+                    yield {
+                        "type": "log",
+                        "agent_id": agent.id,
+                        "data": f"❌ [{agent.name}] No children available, cannot fulfill"
+                    }
                 
                 self.circuit_breaker.record_failure(agent.id)
                 
@@ -194,48 +219,57 @@ class RecursiveDelegator:
                 return
             
             # Phase 3: Delegate to children in PARALLEL
-            yield {
-                "type": "log",
-                "agent_id": agent.id,
-                "data": f"👥 [{agent.name}] Delegating to {len(children)} children in parallel..."
-            }
-            
-            # Create delegation requests for each child
-            child_requests = [
-                request.forward_to(child.id)
-                for child in children
-            ]
+            if self.emit_logs:
+                yield {
+                    "type": "log",
+                    "agent_id": agent.id,
+                    "data": f"👥 [{agent.name}] Delegating to {len(children)} children in parallel..."
+                }
             
-            # Execute all children in parallel
-            child_results = await self._delegate_to_children_parallel(
-                children,
+            # Create delegation requests for each child; a forward that would cycle or
+            # exceed depth is answered here on the child's behalf
+            forwarded_children: List[AgentModel] = []
+            child_requests: List[DelegationRequest] = []
+            child_responses: List[DelegationResponse] = []
+            for child in children:
+                try:
+                    child_requests.append(request.forward_to(child.id))
+                    forwarded_children.append(child)
+                except DelegationRejected as rejected:
+                    for event in self._rejection_events(
+                        child, request, DelegationStatus.ERROR,
+                        rejected.error_message, rejected.log_message
+                    ):
+                        if event["type"] == "delegation_response":
+                            child_responses.append(event["response"])
+                        yield event
+            
+            # Execute all children in parallel, streaming their events as they arrive
+            async for event in self._delegate_to_children_parallel(
+                forwarded_children,
                 child_requests,
-                capability_map
-            )
-            
-            # Stream all child events
-            for result in child_results:
-                for event in result["events"]:
-                    yield event
-            
-            # Aggregate responses
-            child_responses = [r["response"] for r in child_results]
+                capability_map,
+                child_responses
+            ):
+                yield event
             
-            yield {
-                "type": "log",
-                "agent_id": agent.id,
-                "data": f"📊 [{agent.name}] Received {len(child_responses)} responses from children"
-            }
+            if self.emit_logs:
+                yield {
+                    "type": "log",
+                    "agent_id": agent.id,
+                    "data": f"📊 [{agent.name}] Received {len(child_responses)} responses from children"
+                }
             
             # Check if any child fulfilled
             fulfilled = [r for r in child_responses if r.is_successful()]
             
             if fulfilled:
-                yield {
-                    "type": "log",
-                    "agent_id": agent.id,
-                    "data": f"✅ [{agent.name}] {len(fulfilled)} child(ren) fulfilled the request"
-                }
+                if self.emit_logs:
+                    yield {
+                        "type": "log",
+                        "agent_id": agent.id,
+                        "data": f"✅ [{agent.name}] {len(fulfilled)} child(ren) fulfilled the request"
+                    }
                 
                 # Use best response
                 final_response = ResponseAggregator.resolve_conflicts(child_responses)
@@ -250,11 +284,12 @@ class RecursiveDelegator:
                 return
             
             # No child fulfilled
-            yield {
-                "type": "log",
-                "agent_id": agent.id,
-                "data": f"❌ [{agent.name}] No children could fulfill the request"
-            }
+            if self.emit_logs:
+                yield {
+                    "type": "log",
+                    "agent_id": agent.id,
+                    "data": f"❌ [{agent.name}] No children could fulfill the request"
+                }
             
             self.circuit_breaker.record_failure(agent.id)
             
@@ -273,13 +308,14 @@ class RecursiveDelegator:
             return
             
         except Exception as e:
-            logger.error("delegation_error", agent_id=agent.id, error=str(e), exc_info=True)
+            log.error("delegation_error", error=str(e), exc_info=True)
             
-            yield {
-                "type": "log",
-                "agent_id": agent.id,
-                "data": f"💥 [{agent.name}] Error: {str(e)}"
-            }
+            if self.emit_logs:
+                yield {
+                    "type": "log",
+                    "agent_id": agent.id,
+                    "data": f"💥 [{agent.name}] Error: {str(e)}"
+                }
             
             self.circuit_breaker.record_failure(agent.id)
             
@@ -301,38 +337,75 @@ class RecursiveDelegator:
             if request.request_id in self.active_requests:
                 del self.active_requests[request.request_id]
     
-    async def _check_can_handle(self, agent: AgentModel, request: DelegationRequest) -> bool:
+    async def _check_can_handle(self, agent: AgentModel, request: DelegationRequest, log) -> bool:
         """
         Check if agent can handle request directly.
         
-        Uses LLM to analyze agent's capabilities vs request.
+        Verdicts are memoized per (agent, task); concurrent checks for the same
+        pair await the one in-flight LLM call.
         """
-        prompt = f"""Can this agent handle the following request directly?
+        key = (agent.id, hash((request.task, (agent.system_prompt or "")[:500])))
+        pending = self._can_handle_cache.get(key)
+        if pending is not None:
+            self._can_handle_cache.move_to_end(key)
+            return await asyncio.shield(pending)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._can_handle_cache[key] = future
+        if len(self._can_handle_cache) > _CAN_HANDLE_CACHE_SIZE:
+            self._can_handle_cache.popitem(last=False)
+        
+        verdict: Optional[bool] = None
+        try:
+            verdict = await self._ask_can_handle(agent, request, log)
+        finally:
+            if verdict is None:
+                # Failed or cancelled checks default to trying, but are not remembered
+                if self._can_handle_cache.get(key) is future:
+                    del self._can_handle_cache[key]
+                future.set_result(True)
+            else:
+                future.set_result(verdict)
+        return future.result()
+    
+    def _can_handle_prefix(self, agent: AgentModel) -> str:
+        """Agent-specific head of the can-handle prompt, rebuilt only when the agent changes."""
+        cached = self._can_handle_prefixes.get(agent.id)
+        if cached is not None and cached[0] == agent.updated_at:
+            return cached[1]
+        prefix = f"""Can this agent handle the following request directly?
 
 Agent: {agent.name}
 Role: {agent.role}
 Capabilities: {agent.system_prompt[:500]}
 
-Request: {request.task}
-
-Respond with ONLY "YES" or "NO".
-- YES if the agent can handle this directly
-- NO if they need to delegate to specialists"""
+Request: """
+        self._can_handle_prefixes[agent.id] = (agent.updated_at, prefix)
+        return prefix
+    
+    async def _ask_can_handle(self, agent: AgentModel, request: DelegationRequest, log) -> Optional[bool]:
+        """
+        Ask the LLM whether agent can handle request directly.
+        
+        Returns None when the check itself fails.
+        """
+        prompt = f"{self._can_handle_prefix(agent)}{request.task}{_CAN_HANDLE_SUFFIX}"
         
         try:
-            response = await generate_text(
-                system_prompt="You determine if an agent can handle a request. Respond ONLY with YES or NO.",
-                user_input=prompt,
-                model="gemini-2.5-flash",
-                temperature=0.1,
-                api_key=self.api_key
-            )
+            async with self._llm_sem:
+                response = await generate_text(
+                    system_prompt="You determine if an agent can handle a request. Respond ONLY with YES or NO.",
+                    user_input=prompt,
+                    model="gemini-2.5-flash",
+                    temperature=0.1,
+                    api_key=self.api_key
+                )
             
-            can_handle = "YES" in response.upper()
+            # Only the leading token matters; skip whitespace and quote/markdown wrappers
+            can_handle = response.lstrip(" \t\r\n\"'*`")[:3].upper() == "YES"
             
-            logger.info(
+            log.info(
                 "can_handle_check",
-                agent_id=agent.id,
                 can_handle=can_handle,
                 response=response.strip()
             )
@@ -340,14 +413,14 @@ Respond with ONLY "YES" or "NO".
             return can_handle
             
         except Exception as e:
-            logger.error("can_handle_error", agent_id=agent.id, error=str(e))
-            # Default to trying
-            return True
+            log.error("can_handle_error", error=str(e))
+            return None
     
     async def _execute_agent_for_request(
         self,
         agent: AgentModel,
-        request: DelegationRequest
+        request: DelegationRequest,
+        log
     ) -> Dict:
         """
         Execute agent to fulfill a request.
@@ -355,7 +428,9 @@ Respond with ONLY "YES" or "NO".
         Returns dict with events and final response.
         """
         events = []
-        full_output = ""
+        # Chunks are joined once at the end instead of growing a string per token
+        chunks: List[str] = []
+        agent_id = agent.id
         
         # Build prompt
         prompt = f"""Task: {request.task}
@@ -370,21 +445,23 @@ Provide a complete, detailed response."""
             temperature = agent.parameters.get("temperature", 0.7) if agent.parameters else 0.7
             
             # Stream generation
-            async for chunk in generate_streaming(
-                system_prompt=agent.system_prompt,
-                user_input=prompt,
-                model=model,
-                temperature=temperature,
-                api_key=self.api_key
-            ):
-                full_output += chunk
-                events.append({
-                    "type": "output_chunk",
-                    "agent_id": agent.id,
-                    "data": chunk
-                })
+            async with self._llm_sem:
+                async for chunk in generate_streaming(
+                    system_prompt=agent.system_prompt,
+                    user_input=prompt,
+                    model=model,
+                    temperature=temperature,
+                    api_key=self.api_key
+                ):
+                    chunks.append(chunk)
+                    events.append({
+                        "type": "output_chunk",
+                        "agent_id": agent_id,
+                        "data": chunk
+                    })
             
             # Final output
+            full_output = "".join(chunks)
             events.append({
                 "type": "output",
                 "agent_id": agent.id,
@@ -403,7 +480,7 @@ Provide a complete, detailed response."""
             return {"events": events, "response": response}
             
         except Exception as e:
-            logger.error("agent_execution_error", agent_id=agent.id, error=str(e))
+            log.error("agent_execution_error", error=str(e))
             
             events.append({
                 "type": "error",
@@ -425,64 +502,164 @@ Provide a complete, detailed response."""
         self,
         children: List[AgentModel],
         requests: List[DelegationRequest],
-        capability_map: AgentCapability
-    ) -> List[Dict]:
+        capability_map: AgentCapability,
+        responses: List[DelegationResponse]
+    ) -> AsyncGenerator[Dict, None]:
         """
-        Delegate to multiple children in parallel.
+        Delegate to multiple children in parallel, yielding their events as they arrive.
         
-        Returns list of results, each containing events and response.
+        The first child to fulfill with confidence >= _EARLY_ACCEPT_CONFIDENCE wins:
+        the remaining siblings are cancelled rather than awaited. Once the stream ends,
+        the final response of every child that finished has been appended to responses,
+        in child order after any already there; cancelled siblings are left out.
         """
-        async def delegate_to_child(child: AgentModel, request: DelegationRequest) -> Dict:
-            events = []
+        queue: asyncio.Queue = asyncio.Queue()
+        final: List[Optional[DelegationResponse]] = [None] * len(children)
+        child_ids = {child.id for child in children}
+        tasks = [
+            asyncio.create_task(self._drain_child_events(
+                queue, index, child, request, capability_map, final
+            ))
+            for index, (child, request) in enumerate(zip(children, requests))
+        ]
+        try:
+            pending = len(tasks)
+            while pending:
+                kind, item = await queue.get()
+                if kind == "done":
+                    pending -= 1
+                    continue
+                yield item
+                if (
+                    item["type"] == "delegation_response"
+                    and item["agent_id"] in child_ids
+                    and item["response"].is_successful()
+                    and item["response"].confidence >= _EARLY_ACCEPT_CONFIDENCE
+                ):
+                    for child_task in tasks:
+                        child_task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                    # Flush what the cancelled siblings streamed before they stopped
+                    while not queue.empty():
+                        kind, item = queue.get_nowait()
+                        if kind == "event":
+                            yield item
+                    break
+        finally:
+            for child_task in tasks:
+                if not child_task.done():
+                    child_task.cancel()
+        
+        # A sibling cancelled after an early accept never answered, so it has no response
+        responses.extend(response for response in final if response is not None)
+    
+    async def _drain_child_events(
+        self,
+        queue: asyncio.Queue,
+        index: int,
+        child: AgentModel,
+        request: DelegationRequest,
+        capability_map: AgentCapability,
+        final: List[Optional[DelegationResponse]]
+    ):
+        """Run one child subtree, forwarding its events and recording its own response."""
+        try:
             async for event in self.delegate_recursive(child, request, capability_map):
-                events.append(event)
-            
-            # Last event should contain the response
-            # For now, create a simple response
-            return {
-                "events": events,
-                "response": DelegationResponse(
+                if event["type"] == "delegation_response" and event["agent_id"] == child.id:
+                    final[index] = event["response"]
+                await queue.put(("event", event))
+            
+            # delegate_recursive always ends with the child's own response; reaching this
+            # means that contract broke, so report it rather than invent an UNABLE answer
+            if final[index] is None:
+                final[index] = DelegationResponse(
                     request_id=request.request_id,
                     responding_agent_id=child.id,
-                    status=DelegationStatus.UNABLE,  # Placeholder
-                    result="Child response"
+                    status=DelegationStatus.ERROR,
+                    error_message="Child finished without a delegation_response",
+                    path=request.path
                 )
-            }
+        except Exception as e:
+            logger.error("child_delegation_error", child_id=child.id, error=str(e))
+            await queue.put(("event", {
+                "type": "error",
+                "agent_id": child.id,
+                "data": str(e)
+            }))
+            final[index] = DelegationResponse(
+                request_id=request.request_id,
+                responding_agent_id=child.id,
+                status=DelegationStatus.ERROR,
+                error_message=str(e)
+            )
+        finally:
+            await queue.put(("done", child.id))
+    
+    async def _load_children(self, parent_id: str, session_id: Optional[str]) -> List[AgentModel]:
+        """Load child agents, from the preloaded subtree when possible."""
+        if session_id == self._children_session_id and parent_id in self._loaded_parents:
+            return self._children_by_parent.get(parent_id, [])
         
-        tasks = [
-            delegate_to_child(child, request)
-            for child, request in zip(children, requests)
-        ]
+        # Queries run in a worker thread so the event loop keeps streaming sibling
+        # branches; the lock keeps the (non thread-safe) session to one query at a time
+        async with self._load_lock:
+            if session_id != self._children_session_id:
+                self._children_by_parent = {}
+                self._loaded_parents = set()
+                self._children_session_id = session_id
+            if parent_id not in self._loaded_parents:
+                root, descendants = await asyncio.to_thread(self._load_subtree, parent_id, session_id)
+                # Indexed here on the loop, so the lock-free fast path above never sees a
+                # half-built index and ORM state is only touched from one thread
+                self._index_subtree(parent_id, root, descendants)
+        return self._children_by_parent.get(parent_id, [])
+    
+    def _load_subtree(
+        self,
+        root_id: str,
+        session_id: Optional[str]
+    ) -> Tuple[Optional[AgentModel], List[AgentModel]]:
+        """Load root_id and every descendant of it in one recursive query."""
+        child = aliased(AgentModel)
+        subtree = select(AgentModel.id).where(AgentModel.id == root_id).cte("subtree", recursive=True)
+        step = select(child.id).where(child.parent_id == subtree.c.id)
+        if session_id:
+            step = step.where(child.session_id == session_id)
+        # UNION (not UNION ALL) so a cycle in parent_id data cannot recurse forever
+        subtree = subtree.union(step)
         
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        descendants = self.db.query(AgentModel).filter(
+            AgentModel.id.in_(select(subtree.c.id)),
+            AgentModel.id != root_id
+        ).all()
+        # The root normally comes straight from the identity map, without SQL
+        root = self.db.get(AgentModel, root_id)
+        return root, descendants
+    
+    def _index_subtree(
+        self,
+        root_id: str,
+        root: Optional[AgentModel],
+        descendants: List[AgentModel]
+    ):
+        """Index a loaded subtree by parent and prime the ORM children backref."""
+        # Build locally, then publish, so readers only ever see complete entries
+        children_by_parent: Dict[str, List[AgentModel]] = {}
+        loaded_parents: Set[str] = {root_id}
+        for agent in descendants:
+            # Parents indexed by an earlier, nested subtree load already have their children
+            if agent.parent_id not in self._loaded_parents:
+                children_by_parent.setdefault(agent.parent_id, []).append(agent)
+            loaded_parents.add(agent.id)
         
-        # Handle exceptions
-        final_results = []
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                logger.error("child_delegation_error", child_id=children[i].id, error=str(result))
-                final_results.append({
-                    "events": [{
-                        "type": "error",
-                        "agent_id": children[i].id,
-                        "data": str(result)
-                    }],
-                    "response": DelegationResponse(
-                        request_id=requests[i].request_id,
-                        responding_agent_id=children[i].id,
-                        status=DelegationStatus.ERROR,
-                        error_message=str(result)
-                    )
-                })
-            else:
-                final_results.append(result)
+        # Prime the ORM "children" backref from the same rows, so code touching
+        # agent.children never lazy-loads per node. Only valid unfiltered or within
+        # one session, which the agents API guarantees for parent/child pairs.
+        for agent in ([root] if root is not None else []) + descendants:
+            if agent.id not in self._loaded_parents:
+                set_committed_value(agent, "children", list(children_by_parent.get(agent.id, [])))
         
-        return final_results
-    
-    def _load_children(self, parent_id: str, session_id: Optional[str]) -> List[AgentModel]:
-        """Load child agents."""
-        query = self.db.query(AgentModel).filter(AgentModel.parent_id == parent_id)
-        if session_id:
-            query = query.filter(AgentModel.session_id == session_id)
-        return query.all()
+        for agent_id, agent_children in children_by_parent.items():
+            self._children_by_parent.setdefault(agent_id, []).extend(agent_children)
+        self._loaded_parents |= loaded_parents
 
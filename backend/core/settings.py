@@ -7,16 +7,27 @@ class Settings(BaseSettings):
     
     # Gemini API
     gemini_api_key: str = ""
+    gemini_max_concurrency: int = 8  # Max in-flight Gemini calls per orchestrator run
+    max_parallel_children: int = 4  # Max sibling agents streaming at once (message-based orchestrator)
+    gemini_prompt_cache_min_chars: int = 16000  # System prompts at least this long are cached server-side
+    gemini_prompt_cache_ttl_seconds: int = 600  # Lifetime of a cached system prompt
+    agent_selection_cache_ttl_seconds: int = 300  # Reuse an agent-selection verdict for identical inputs
     
     # Database
     database_url: str = "sqlite:///./agents.db"
+    db_pool_size: int = 20  # Connections kept open in the pool
+    db_max_overflow: int = 10  # Extra connections allowed under burst load
+    db_pool_timeout: int = 30  # Seconds to wait for a free connection
+    db_query_cache_size: int = 1200  # Compiled SQL statements cached per engine
     
     # Server
     host: str = "0.0.0.0"
     port: int = 8000
+    reload: bool = True  # Dev auto-reload; turn off in production so workers applies
+    workers: int = 1  # Worker processes for `python main.py` (ignored while reload is on)
     
     # CORS
-    cors_origins: list[str] = ["http://localhost:3000"]
+    cors_origins: frozenset[str] = frozenset({"http://localhost:3000"})  # Env still takes a JSON list
     
     # Logging
     log_level: str = "INFO"
@@ -1,24 +1,78 @@
 """Database connection and session management."""
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, make_url, text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import sessionmaker, Session
 from contextlib import contextmanager
+import asyncio
 
 from core.settings import settings
 from db.schemas import Base
 
-# Create engine
+# Decided from the URL's scheme, not a substring match on the whole URL
+_is_sqlite = make_url(settings.database_url).get_backend_name() == "sqlite"
+
+# Create engine; the QueuePool keeps connections open across requests
 engine = create_engine(
     settings.database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {},
+    connect_args={"check_same_thread": False} if _is_sqlite else {},
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    # Server databases can drop idle connections; a local SQLite file cannot
+    pool_pre_ping=not _is_sqlite,
+    # Compiled-SQL cache entries (SQLAlchemy default 500); ORM loads, lazy loads and
+    # the route queries each take their own, so the default can churn
+    query_cache_size=settings.db_query_cache_size,
 )
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+if _is_sqlite:
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+        """
+        Tune each new SQLite connection: WAL lets readers proceed during writes,
+        and synchronous=NORMAL is durable under WAL with far fewer fsyncs.
+        """
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+        cursor.execute("PRAGMA cache_size=-65536")  # 64 MiB (negative = KiB)
+        cursor.close()
+
+# Create session factory; objects stay loaded after commit so routes can return what
+# they just wrote without a refresh. Server-generated columns (timestamps) come back
+# via RETURNING or load on first access.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 
 def init_db() -> None:
     """Initialize database tables."""
-    Base.metadata.create_all(bind=engine)
+    try:
+        Base.metadata.create_all(bind=engine)
+    except DBAPIError:
+        # Another worker created a table between our existence check and CREATE;
+        # the retry sees it and only creates what is still missing
+        Base.metadata.create_all(bind=engine)
+
+
+def _warm_connections(n: int) -> None:
+    # Hold every connection until all are open, otherwise the pool would hand the
+    # same one back out; closing returns them to the pool ready for use
+    connections = []
+    try:
+        for _ in range(n):
+            conn = engine.connect()
+            connections.append(conn)
+            conn.execute(text("SELECT 1"))
+    finally:
+        for conn in connections:
+            conn.close()
+
+
+async def warm_connection_pool(n: int = settings.db_pool_size) -> None:
+    """Open n pooled connections up front so the first n concurrent requests skip the connect handshake."""
+    await asyncio.to_thread(_warm_connections, n)
 
 
 @contextmanager
@@ -0,0 +1,50 @@
+"""server_default_timestamps
+
+Revision ID: 3add469d49e8
+Revises: 7acd94386564
+Create Date: 2026-10-15 18:20:36.915402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3add469d49e8'
+down_revision: Union[str, None] = '7acd94386564'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Row timestamps now stamped by the database (see db.schemas.utcnow)
+TIMESTAMP_COLUMNS = {
+    'sessions': ['created_at', 'last_accessed'],
+    'agents': ['created_at', 'updated_at'],
+    'links': ['created_at'],
+    'runs': ['created_at'],
+}
+
+
+def _utcnow_default(dialect_name: str) -> sa.TextClause:
+    if dialect_name == "postgresql":
+        return sa.text("TIMEZONE('utc', CURRENT_TIMESTAMP)")
+    if dialect_name == "sqlite":
+        return sa.text("(STRFTIME('%Y-%m-%d %H:%M:%f', 'now'))")
+    return sa.text("CURRENT_TIMESTAMP")
+
+
+def upgrade() -> None:
+    default = _utcnow_default(op.get_bind().dialect.name)
+    for table, columns in TIMESTAMP_COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                batch_op.alter_column(column, existing_type=sa.DateTime(), server_default=default)
+
+
+def downgrade() -> None:
+    for table, columns in TIMESTAMP_COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                batch_op.alter_column(column, existing_type=sa.DateTime(), server_default=None)
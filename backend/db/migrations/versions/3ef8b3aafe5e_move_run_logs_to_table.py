@@ -0,0 +1,75 @@
+"""move_run_logs_to_table
+
+Revision ID: 3ef8b3aafe5e
+Revises: 3add469d49e8
+Create Date: 2026-10-15 18:47:12.336870
+
+"""
+from typing import Sequence, Union
+from datetime import datetime
+import json
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3ef8b3aafe5e'
+down_revision: Union[str, None] = '3add469d49e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Match the native uuid ids from 7acd94386564 on PostgreSQL
+    bind = op.get_bind()
+    id_type = postgresql.UUID(as_uuid=False) if bind.dialect.name == "postgresql" else sa.String()
+    # Same UTC default as the other row timestamps (see 3add469d49e8)
+    if bind.dialect.name == "postgresql":
+        utcnow = sa.text("TIMEZONE('utc', CURRENT_TIMESTAMP)")
+    elif bind.dialect.name == "sqlite":
+        utcnow = sa.text("(STRFTIME('%Y-%m-%d %H:%M:%f', 'now'))")
+    else:
+        utcnow = sa.text("CURRENT_TIMESTAMP")
+    run_logs = op.create_table('run_logs',
+    sa.Column('id', id_type, nullable=False),
+    sa.Column('run_id', id_type, nullable=False),
+    sa.Column('agent_id', sa.String(), nullable=False),
+    sa.Column('timestamp', sa.DateTime(), server_default=utcnow, nullable=False),
+    sa.Column('level', sa.String(), nullable=False),
+    sa.Column('message', sa.Text(), nullable=False),
+    sa.ForeignKeyConstraint(['run_id'], ['runs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_run_logs_run_ts', 'run_logs', ['run_id', 'timestamp'], unique=False)
+    
+    # Copy any existing JSON log entries into rows
+    rows = []
+    for run_id, logs in bind.execute(sa.text("SELECT id, logs FROM runs WHERE logs IS NOT NULL")):
+        if isinstance(logs, str):
+            logs = json.loads(logs)
+        for entry in logs or []:
+            timestamp = entry.get('timestamp')
+            rows.append({
+                'id': str(uuid.uuid4()),
+                'run_id': str(run_id),
+                'agent_id': entry.get('agent_id', ''),
+                'timestamp': datetime.fromisoformat(timestamp) if isinstance(timestamp, str) else datetime.utcnow(),
+                'level': entry.get('level', 'info'),
+                'message': entry.get('message', ''),
+            })
+    if rows:
+        op.bulk_insert(run_logs, rows)
+    
+    with op.batch_alter_table('runs') as batch_op:
+        batch_op.drop_column('logs')
+
+
+def downgrade() -> None:
+    # Entries are not copied back; the restored column starts empty
+    with op.batch_alter_table('runs') as batch_op:
+        batch_op.add_column(sa.Column('logs', sa.JSON(), nullable=True, server_default='[]'))
+    op.drop_index('ix_run_logs_run_ts', table_name='run_logs')
+    op.drop_table('run_logs')
@@ -0,0 +1,26 @@
+"""add_agents_parent_id_index
+
+Revision ID: 3f9d2c7a41b8
+Revises: 7c123436cb2e
+Create Date: 2026-10-15 10:12:31.418202
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9d2c7a41b8'
+down_revision: Union[str, None] = '7c123436cb2e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_agents_parent_id', 'agents', ['parent_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_agents_parent_id', table_name='agents')
@@ -0,0 +1,29 @@
+"""add_agents_parent_session_index
+
+Revision ID: 5b8e1d2f9c04
+Revises: 3f9d2c7a41b8
+Create Date: 2026-10-15 14:03:52.771906
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e1d2f9c04'
+down_revision: Union[str, None] = '3f9d2c7a41b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The composite index also serves parent_id-only lookups, so it replaces ix_agents_parent_id
+    op.create_index('ix_agents_parent_session', 'agents', ['parent_id', 'session_id'], unique=False)
+    op.drop_index('ix_agents_parent_id', table_name='agents')
+
+
+def downgrade() -> None:
+    op.create_index('ix_agents_parent_id', 'agents', ['parent_id'], unique=False)
+    op.drop_index('ix_agents_parent_session', table_name='agents')
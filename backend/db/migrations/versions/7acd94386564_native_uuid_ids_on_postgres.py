@@ -0,0 +1,75 @@
+"""native_uuid_ids_on_postgres
+
+Revision ID: 7acd94386564
+Revises: c061e4f9281e
+Create Date: 2026-10-15 17:52:19.068341
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7acd94386564'
+down_revision: Union[str, None] = 'c061e4f9281e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Every primary and foreign key column that holds a generated UUID
+UUID_COLUMNS = {
+    'sessions': ['id'],
+    'agents': ['id', 'session_id', 'parent_id'],
+    'links': ['id', 'session_id', 'parent_agent_id', 'child_agent_id'],
+    'runs': ['id', 'session_id', 'root_agent_id'],
+}
+
+
+def _convert(to_uuid: bool) -> None:
+    # Only PostgreSQL has a native uuid type; other backends keep text ids (see db.schemas.GUID)
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    
+    # Both ends of a foreign key must change type together, so drop and re-create them
+    inspector = sa.inspect(bind)
+    foreign_keys = {table: inspector.get_foreign_keys(table) for table in UUID_COLUMNS}
+    for table, fks in foreign_keys.items():
+        for fk in fks:
+            op.drop_constraint(fk['name'], table, type_='foreignkey')
+    
+    for table, columns in UUID_COLUMNS.items():
+        for column in columns:
+            if to_uuid:
+                op.alter_column(
+                    table, column,
+                    existing_type=sa.String(),
+                    type_=postgresql.UUID(as_uuid=False),
+                    postgresql_using=f"{column}::uuid",
+                )
+            else:
+                op.alter_column(
+                    table, column,
+                    existing_type=postgresql.UUID(as_uuid=False),
+                    type_=sa.String(),
+                    postgresql_using=f"{column}::text",
+                )
+    
+    for table, fks in foreign_keys.items():
+        for fk in fks:
+            op.create_foreign_key(
+                fk['name'], table, fk['referred_table'],
+                fk['constrained_columns'], fk['referred_columns'],
+                ondelete=fk.get('options', {}).get('ondelete'),
+            )
+
+
+def upgrade() -> None:
+    _convert(to_uuid=True)
+
+
+def downgrade() -> None:
+    _convert(to_uuid=False)
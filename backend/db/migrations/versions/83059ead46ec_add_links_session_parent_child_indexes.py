@@ -0,0 +1,29 @@
+"""add_links_session_parent_child_indexes
+
+Revision ID: 83059ead46ec
+Revises: 5b8e1d2f9c04
+Create Date: 2026-10-15 16:41:07.203518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '83059ead46ec'
+down_revision: Union[str, None] = '5b8e1d2f9c04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # init_db() may already have created these from the models
+    op.create_index('ix_links_session_parent', 'links', ['session_id', 'parent_agent_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_links_session_child', 'links', ['session_id', 'child_agent_id'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_links_session_child', table_name='links')
+    op.drop_index('ix_links_session_parent', table_name='links')
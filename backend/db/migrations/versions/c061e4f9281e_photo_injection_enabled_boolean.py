@@ -0,0 +1,53 @@
+"""photo_injection_enabled_boolean
+
+Revision ID: c061e4f9281e
+Revises: 83059ead46ec
+Create Date: 2026-10-15 17:08:44.519230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c061e4f9281e'
+down_revision: Union[str, None] = '83059ead46ec'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    is_sqlite = op.get_bind().dialect.name == "sqlite"
+    op.execute("UPDATE agents SET photo_injection_enabled = 'false' WHERE photo_injection_enabled IS NULL")
+    if is_sqlite:
+        # SQLite stores booleans as 0/1; the batch table copy keeps the values as-is
+        op.execute("UPDATE agents SET photo_injection_enabled = (photo_injection_enabled = 'true')")
+    with op.batch_alter_table('agents') as batch_op:
+        # Drop the string default first so Postgres does not try to cast it
+        batch_op.alter_column('photo_injection_enabled', existing_type=sa.String(), server_default=None)
+        batch_op.alter_column(
+            'photo_injection_enabled',
+            existing_type=sa.String(),
+            type_=sa.Boolean(),
+            nullable=False,
+            server_default=sa.false(),
+            postgresql_using="photo_injection_enabled = 'true'",
+        )
+
+
+def downgrade() -> None:
+    is_sqlite = op.get_bind().dialect.name == "sqlite"
+    with op.batch_alter_table('agents') as batch_op:
+        batch_op.alter_column('photo_injection_enabled', existing_type=sa.Boolean(), server_default=None)
+        batch_op.alter_column(
+            'photo_injection_enabled',
+            existing_type=sa.Boolean(),
+            type_=sa.String(),
+            nullable=True,
+            server_default='false',
+            postgresql_using="CASE WHEN photo_injection_enabled THEN 'true' ELSE 'false' END",
+        )
+    if is_sqlite:
+        op.execute("UPDATE agents SET photo_injection_enabled = CASE WHEN photo_injection_enabled = 1 THEN 'true' ELSE 'false' END")
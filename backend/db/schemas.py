@@ -1,26 +1,91 @@
 """SQLAlchemy database models."""
-from sqlalchemy import Column, String, Text, JSON, DateTime, ForeignKey, Float, Index
+from sqlalchemy import Boolean, Column, String, Text, JSON, DateTime, ForeignKey, Float, Index, false
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.orm import relationship
-from datetime import datetime
+import os
+import time
 import uuid
 
 Base = declarative_base()
 
 
 def generate_id() -> str:
-    """Generate a UUID string."""
-    return str(uuid.uuid4())
+    """
+    Generate a UUID string, version 7: a millisecond timestamp followed by random bits.
+    
+    Ids created later sort later, so inserts land at the right edge of the primary
+    key indexes instead of at random pages.
+    """
+    rand = int.from_bytes(os.urandom(10), "big")
+    value = (
+        (time.time_ns() // 1_000_000) << 80  # 48-bit unix_ts_ms
+        | 0x7 << 76  # version
+        | (rand >> 68) << 64  # 12 random bits
+        | 0b10 << 62  # variant
+        | rand & ((1 << 62) - 1)  # 62 random bits
+    )
+    return str(uuid.UUID(int=value))
+
+
+class utcnow(FunctionElement):
+    """Current UTC time evaluated by the database, for column defaults and updates."""
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow, "postgresql")
+def _pg_utcnow(element, compiler, **kw) -> str:
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+@compiles(utcnow, "sqlite")
+def _sqlite_utcnow(element, compiler, **kw) -> str:
+    # CURRENT_TIMESTAMP only has second resolution; %f adds milliseconds
+    return "STRFTIME('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+@compiles(utcnow)
+def _default_utcnow(element, compiler, **kw) -> str:
+    return "CURRENT_TIMESTAMP"
+
+
+class GUID(TypeDecorator):
+    """
+    UUID id column that the application always sees as a str.
+    
+    Stored as a native 16-byte uuid on PostgreSQL and as text elsewhere (SQLite keeps
+    its existing rows unchanged). A bound value that is not a valid UUID (e.g. a bad
+    id in a URL) binds as NULL on PostgreSQL so lookups miss instead of raising.
+    """
+    impl = String
+    cache_ok = True
+    
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=False))
+        return dialect.type_descriptor(String())
+    
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name != "postgresql":
+            return value
+        try:
+            return str(uuid.UUID(str(value)))
+        except ValueError:
+            return None
 
 
 class SessionModel(Base):
     """Session database model for multi-tenant isolation."""
     __tablename__ = "sessions"
 
-    id = Column(String, primary_key=True, default=generate_id)
+    id = Column(GUID(), primary_key=True, default=generate_id)
     name = Column(String, nullable=False, unique=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    last_accessed = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
+    last_accessed = Column(DateTime, server_default=utcnow(), onupdate=utcnow())
     
     # Relationships
     agents = relationship("AgentModel", back_populates="session", cascade="all, delete-orphan")
@@ -32,66 +97,97 @@ class AgentModel(Base):
     """Agent database model."""
     __tablename__ = "agents"
 
-    id = Column(String, primary_key=True, default=generate_id)
-    session_id = Column(String, ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False, index=True)
+    id = Column(GUID(), primary_key=True, default=generate_id)
+    session_id = Column(GUID(), ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False, index=True)
     name = Column(String, nullable=False)
     role = Column(String, nullable=False)
     system_prompt = Column(Text, nullable=False)
     tools = Column(JSON, default=list)
     parameters = Column(JSON, default=dict)
-    photo_injection_enabled = Column(String, default="false")  # "true" or "false" as string for JSON compatibility
+    photo_injection_enabled = Column(Boolean, default=False, server_default=false(), nullable=False)
     photo_injection_features = Column(JSON, default=list)  # List of custom features/capabilities
-    parent_id = Column(String, ForeignKey("agents.id"), nullable=True)
+    parent_id = Column(GUID(), ForeignKey("agents.id"), nullable=True)
     position_x = Column(Float, nullable=True)
     position_y = Column(Float, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
+    updated_at = Column(DateTime, server_default=utcnow(), onupdate=utcnow())
 
     # Relationships
     session = relationship("SessionModel", back_populates="agents")
     parent = relationship("AgentModel", remote_side=[id], backref="children")
     
-    # Index for efficient session queries
-    __table_args__ = (Index("ix_agents_session_id", "session_id"),)
+    # Indexes for efficient session queries and child lookups
+    __table_args__ = (
+        Index("ix_agents_session_id", "session_id"),
+        # Child loads filter on parent_id and session_id; also covers parent_id alone
+        Index("ix_agents_parent_session", "parent_id", "session_id"),
+    )
 
 
 class LinkModel(Base):
     """Link between parent and child agents."""
     __tablename__ = "links"
 
-    id = Column(String, primary_key=True, default=generate_id)
-    session_id = Column(String, ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False, index=True)
-    parent_agent_id = Column(String, ForeignKey("agents.id"), nullable=False)
-    child_agent_id = Column(String, ForeignKey("agents.id"), nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    id = Column(GUID(), primary_key=True, default=generate_id)
+    session_id = Column(GUID(), ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False, index=True)
+    parent_agent_id = Column(GUID(), ForeignKey("agents.id"), nullable=False)
+    child_agent_id = Column(GUID(), ForeignKey("agents.id"), nullable=False)
+    created_at = Column(DateTime, server_default=utcnow())
     
     # Relationships
     session = relationship("SessionModel", back_populates="links")
     
-    # Index for efficient session queries
-    __table_args__ = (Index("ix_links_session_id", "session_id"),)
+    # Indexes for efficient session queries and per-agent link lookups
+    __table_args__ = (
+        Index("ix_links_session_id", "session_id"),
+        Index("ix_links_session_parent", "session_id", "parent_agent_id"),
+        Index("ix_links_session_child", "session_id", "child_agent_id"),
+    )
 
 
 class RunModel(Base):
     """Run execution model."""
     __tablename__ = "runs"
 
-    id = Column(String, primary_key=True, default=generate_id)
-    session_id = Column(String, ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False, index=True)
-    root_agent_id = Column(String, ForeignKey("agents.id"), nullable=False)
+    id = Column(GUID(), primary_key=True, default=generate_id)
+    session_id = Column(GUID(), ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False, index=True)
+    root_agent_id = Column(GUID(), ForeignKey("agents.id"), nullable=False)
     status = Column(String, default="pending")  # pending, running, completed, failed, cancelled
     input = Column(JSON, default=dict)
     output = Column(JSON, default=dict)  # agent_id -> output string
-    logs = Column(JSON, default=list)  # List of RunLog dicts
     error = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
     started_at = Column(DateTime, nullable=True)
     finished_at = Column(DateTime, nullable=True)
     
     # Relationships
     session = relationship("SessionModel", back_populates="runs")
+    logs = relationship(
+        "RunLogModel",
+        back_populates="run",
+        order_by="RunLogModel.timestamp",
+        cascade="all, delete-orphan",
+    )
     
     # Index for efficient session queries
     __table_args__ = (Index("ix_runs_session_id", "session_id"),)
 
 
+class RunLogModel(Base):
+    """Log entry for a run; one row per entry so appends never rewrite the run."""
+    __tablename__ = "run_logs"
+
+    id = Column(GUID(), primary_key=True, default=generate_id)
+    run_id = Column(GUID(), ForeignKey("runs.id", ondelete="CASCADE"), nullable=False)
+    agent_id = Column(String, nullable=False)
+    timestamp = Column(DateTime, server_default=utcnow(), nullable=False)
+    level = Column(String, default="info", nullable=False)
+    message = Column(Text, nullable=False)
+    
+    # Relationships
+    run = relationship("RunModel", back_populates="logs")
+    
+    # Index for reading a run's log in order (and tailing it)
+    __table_args__ = (Index("ix_run_logs_run_ts", "run_id", "timestamp"),)
+
+
@@ -1,27 +1,44 @@
 """FastAPI application entry point."""
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Dict, Any
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict
 
 from core.settings import settings
 from core.logging import configure_logging, get_logger
 from api.router import api_router
-from db.database import init_db
+from db.database import init_db, warm_connection_pool
 
 # Configure logging
 configure_logging()
 logger = get_logger("main")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown hooks."""
+    # DDL runs once the loop is up, not on `import main` (reloader, tooling)
+    await asyncio.to_thread(init_db)
+    await warm_connection_pool()
+    logger.info("connection_pool_warmed")
+    yield
+
+
 # Create FastAPI app
 app = FastAPI(
     title="AI Agent Product Design Lab API",
     description="Backend API for multi-agent orchestration",
     version="0.1.0",
+    lifespan=lifespan,
+    # orjson renders every JSON response body
+    default_response_class=ORJSONResponse,
 )
 
 # CORS middleware - must be added before routes
-cors_origins = settings.cors_origins or ["*"]
+# Starlette checks each request's Origin with `in`; the frozenset makes that a hash lookup
+cors_origins = settings.cors_origins or frozenset({"*"})
 app.add_middleware(
     CORSMiddleware,
     allow_origins=cors_origins,
@@ -32,33 +49,37 @@ app.add_middleware(
     max_age=3600,
 )
 
-# Initialize database
-init_db()
-
 # Include API routes
 app.include_router(api_router)
 
 # Request model for test prompt
 class PromptRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     system_prompt: str
     user_input: str
     model: str = "gemini-2.5-flash"
 
 
+# Health responses never change; serialize the body once
+_HEALTH_RESPONSE = ORJSONResponse({"status": "healthy"})
+
+
 @app.get("/health")
-async def health_check() -> Dict[str, str]:
+async def health_check() -> ORJSONResponse:
     """Health check endpoint."""
-    return {"status": "healthy"}
+    return _HEALTH_RESPONSE
 
 
 @app.post("/api/test-prompt")
-async def test_prompt(req: PromptRequest) -> Dict[str, Any]:
+async def test_prompt(req: PromptRequest) -> ORJSONResponse:
     """Test endpoint for Gemini prompt (placeholder)."""
     logger.info("test_prompt_called", model=req.model)
-    return {
+    # Returned as a response so FastAPI skips response-model validation and jsonable_encoder
+    return ORJSONResponse({
         "text": f"Test response for: {req.user_input}",
         "note": "Gemini integration not yet implemented",
-    }
+    })
 
 
 if __name__ == "__main__":
@@ -67,6 +88,10 @@ if __name__ == "__main__":
         "main:app",
         host=settings.host,
         port=settings.port,
-        reload=True,
+        reload=settings.reload,
+        workers=None if settings.reload else settings.workers,
+        # "auto" picks uvloop and httptools when installed (uvloop is skipped on Windows)
+        loop="auto",
+        http="auto",
     )
 